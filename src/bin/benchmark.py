@@ -0,0 +1,331 @@
+#!/usr/bin/env python
+
+"""Benchmark section prediction throughput and latency on synthetic notes.
+
+Each configuration of the grid of call batch sizes (notes given to each
+``SectionPredictor.predict`` call), model batch sizes (documents in each
+forward pass, or ``feature_prediction_mapper:batch_size``), torch CPU thread
+counts and section filter types is written as a JSON line with the number of
+notes and tokens per second, the p50 and p99 latency of each call and the peak
+resident set size.  The notes are generated from a seed, so runs are
+reproducible across machines and versions.
+
+The peak resident set size only increases in a process, so it is the peak of
+all configurations run so far (``rss_scope`` is ``process``) unless each
+configuration is run in its own process with ``--isolate`` (``rss_scope`` is
+``configuration``).
+
+The packaged models must be installed (i.e. by predicting a note with
+``mimicsid`` once) to run offline.  Run on CPU with::
+
+    CUDA_VISIBLE_DEVICES= ./src/bin/benchmark.py -o benchmark.jsonl
+
+"""
+
+from typing import Tuple, List, Dict, Any, Iterable
+from dataclasses import dataclass, field, replace
+import sys
+import os
+import json
+import random
+import platform
+import resource
+import argparse
+import itertools as it
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from io import TextIOBase
+import numpy as np
+from zensols.config import Dictable
+from zensols.persist import dealloc
+from zensols.deeplearn.model import ModelUnpacker, ModelFacade
+from zensols.mimicsid import ApplicationFactory, SectionFilterType
+from zensols.mimicsid.pred import SectionPredictor
+
+
+@dataclass
+class SyntheticNoteFactory(Dictable):
+    """Generates MIMIC-III style notes with a given number of sections and
+    approximate number of tokens.
+
+    """
+    HEADERS = ('Chief Complaint', 'History of Present Illness',
+               'Past Medical History', 'Social History', 'Family History',
+               'Physical Exam', 'Pertinent Results', 'Brief Hospital Course',
+               'Medications on Admission', 'Discharge Medications',
+               'Discharge Disposition', 'Discharge Diagnosis',
+               'Discharge Condition', 'Discharge Instructions',
+               'Followup Instructions')
+    """The section headers of the generated notes."""
+
+    WORDS = tuple(('patient presented with worsening dyspnea cough fever ' +
+                   'chest pain denies nausea history of hypertension ' +
+                   'diabetes renal failure was admitted to the floor and ' +
+                   'treated with antibiotics mg PO daily BID stable ' +
+                   'afebrile normal sinus rhythm no acute distress').split())
+    """The vocabulary of the generated section bodies."""
+
+    seed: int = field(default=0)
+    """The random seed used to generate the notes."""
+
+    def create(self, n_notes: int, sections: int, tokens: int) -> List[str]:
+        """Create the text of synthetic notes.
+
+        :param n_notes: the number of notes to create
+
+        :param sections: the number of sections in each note
+
+        :param tokens: the approximate number of body tokens in each note
+
+        """
+        rand = random.Random(self.seed)
+        per_sec: int = max(1, tokens // max(1, sections))
+
+        def create_section(header: str) -> str:
+            words: List[str] = rand.choices(self.WORDS, k=per_sec)
+            lines: List[str] = [' '.join(words[i:i + 12]) + '.'
+                                for i in range(0, len(words), 12)]
+            return f'{header}:\n' + '\n'.join(lines)
+
+        def create_note() -> str:
+            headers: List[str] = [self.HEADERS[i % len(self.HEADERS)]
+                                  for i in range(sections)]
+            day: int = rand.randint(1, 20)
+            return (f'Admission Date:  [**2151-7-{day}**]       ' +
+                    f'Discharge Date:  [**2151-8-{day}**]\n\n' +
+                    '\n\n'.join(map(create_section, headers)) + '\n')
+
+        return [create_note() for _ in range(n_notes)]
+
+
+def create_section_predictor() -> SectionPredictor:
+    """Create a predictor that keeps its models across predictions."""
+    sp: SectionPredictor = ApplicationFactory.section_predictor()
+    sp.auto_deallocate = False
+    # each configuration predicts the same notes, so parse them every time
+    sp.doc_cache = None
+    return sp
+
+
+def _run_isolated(bench: 'Benchmark') -> Dict[str, Any]:
+    """Run the single configuration of ``bench`` in a child process."""
+    sp: SectionPredictor = create_section_predictor()
+    with dealloc(sp):
+        return next(iter(replace(bench, section_predictor=sp)))
+
+
+@dataclass
+class Benchmark(Dictable):
+    """Predicts synthetic notes over a grid of call batch sizes, model batch
+    sizes, thread counts and section filter types.
+
+    """
+    note_factory: SyntheticNoteFactory = field()
+    """Generates the notes to predict."""
+
+    section_predictor: SectionPredictor = field(default=None)
+    """The predictor to benchmark, which is kept allocated across runs.  It is
+    not used, and may be ``None``, when :obj:`isolate` is ``True``.
+
+    """
+
+    notes: int = field(default=64)
+    """The number of notes predicted by each configuration."""
+
+    sections: int = field(default=8)
+    """The number of sections in each note."""
+
+    tokens: int = field(default=400)
+    """The approximate number of tokens in each note."""
+
+    batch_sizes: Tuple[int, ...] = field(default=(1, 8, 32))
+    """The number of notes predicted in each call."""
+
+    model_batch_sizes: Tuple[int, ...] = field(default=(1, 8))
+    """The number of documents (or windows) in each batch given to the models
+    (``feature_prediction_mapper:batch_size``).
+
+    """
+
+    threads: Tuple[int, ...] = field(default=(1, 4))
+    """The torch CPU (intra-op) thread counts."""
+
+    filter_types: Tuple[SectionFilterType, ...] = field(
+        default=(SectionFilterType.keep_classified,))
+    """The section filter types of the predictor."""
+
+    isolate: bool = field(default=False)
+    """Whether to run each configuration in its own process so the peak
+    resident set size is that of the configuration.
+
+    """
+
+    @staticmethod
+    def _peak_rss() -> int:
+        """Return the peak resident set size of this process in bytes."""
+        rss: int = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux and bytes on macOS
+        return rss if sys.platform == 'darwin' else rss * 1024
+
+    def _environment(self) -> Dict[str, Any]:
+        import torch
+        sp: SectionPredictor = self.section_predictor
+        return {'model_version': sp.config_factory.config.get_option(
+                    'version', 'msid_model'),
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'concurrent_models': sp.concurrent_models,
+                'fuse_models': sp.fuse_models,
+                'parse_workers': sp.parse_workers,
+                'seed': self.note_factory.seed}
+
+    def _set_model_batch_size(self, batch_size: int):
+        """Set the number of documents in each batch given to the models."""
+        sp: SectionPredictor = self.section_predictor
+        unpacker: ModelUnpacker
+        for unpacker in (sp.section_id_model_unpacker,
+                         sp.header_model_unpacker):
+            if unpacker is not None:
+                facade: ModelFacade = unpacker.facade
+                # the mapper is created from the config for each prediction
+                facade.config_factory.config.set_option(
+                    'batch_size', str(batch_size),
+                    section=facade.model_settings.prediction_mapper_name)
+
+    def _run(self, texts: List[str], batch_size: int, model_batch_size: int,
+             threads: int, filter_type: SectionFilterType) -> Dict[str, Any]:
+        import torch
+        sp: SectionPredictor = self.section_predictor
+        torch.set_num_threads(threads)
+        self._set_model_batch_size(model_batch_size)
+        sp.section_filter_type = filter_type
+        sp.stats.clear()
+        latencies: List[float] = []
+        start: float = perf_counter()
+        for i in range(0, len(texts), batch_size):
+            t: float = perf_counter()
+            sp.predict(texts[i:i + batch_size])
+            latencies.append(perf_counter() - t)
+        elapsed: float = perf_counter() - start
+        lat_ms: np.ndarray = np.array(latencies) * 1000
+        return {'batch_size': batch_size,
+                'model_batch_size': model_batch_size,
+                'threads': threads,
+                'filter_type': filter_type.name,
+                'notes': sp.stats.notes,
+                'tokens': sp.stats.tokens,
+                'sections': sp.stats.sections,
+                'seconds': elapsed,
+                'notes_per_sec': sp.stats.notes / elapsed,
+                'tokens_per_sec': sp.stats.tokens / elapsed,
+                'latency_p50_ms': float(np.percentile(lat_ms, 50)),
+                'latency_p99_ms': float(np.percentile(lat_ms, 99)),
+                'peak_rss_bytes': self._peak_rss(),
+                'rss_scope': 'configuration' if len(self) == 1 else 'process',
+                'stages': dict(sp.stats.seconds)}
+
+    def _grid(self) -> Iterable[Tuple[int, int, int, SectionFilterType]]:
+        return it.product(self.batch_sizes, self.model_batch_sizes,
+                          self.threads, self.filter_types)
+
+    def __len__(self) -> int:
+        """The number of configurations."""
+        return len(self.batch_sizes) * len(self.model_batch_sizes) * \
+            len(self.threads) * len(self.filter_types)
+
+    def _iter_isolated(self) -> Iterable[Dict[str, Any]]:
+        ctx = mp.get_context('spawn')
+        batch_size: int
+        model_batch_size: int
+        threads: int
+        filter_type: SectionFilterType
+        for batch_size, model_batch_size, threads, filter_type in self._grid():
+            bench: Benchmark = replace(
+                self,
+                section_predictor=None,
+                batch_sizes=(batch_size,),
+                model_batch_sizes=(model_batch_size,),
+                threads=(threads,),
+                filter_types=(filter_type,),
+                isolate=False)
+            with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+                yield pool.submit(_run_isolated, bench).result()
+
+    def __iter__(self) -> Iterable[Dict[str, Any]]:
+        """Warm up the models and return a result for each configuration."""
+        if self.isolate:
+            yield from self._iter_isolated()
+            return
+        sp: SectionPredictor = self.section_predictor
+        texts: List[str] = self.note_factory.create(
+            self.notes, self.sections, self.tokens)
+        env: Dict[str, Any] = self._environment()
+        env['warm_up'] = sp.warm_up()
+        conf: Tuple[int, int, int, SectionFilterType]
+        for conf in self._grid():
+            res: Dict[str, Any] = self._run(texts, *conf)
+            res.update({'note_sections': self.sections,
+                        'note_tokens': self.tokens,
+                        'environment': env})
+            yield res
+
+    def write(self, depth: int = 0, writer: TextIOBase = sys.stdout):
+        res: Dict[str, Any]
+        for res in self:
+            writer.write(json.dumps(res) + '\n')
+            writer.flush()
+
+
+def main():
+    def ints(s: str) -> Tuple[int, ...]:
+        return tuple(map(int, s.split(',')))
+
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--notes', type=int, default=64,
+                        help='the number of notes of each configuration')
+    parser.add_argument('-s', '--sections', type=int, default=8,
+                        help='the number of sections in each note')
+    parser.add_argument('-t', '--tokens', type=int, default=400,
+                        help='the approximate number of tokens in each note')
+    parser.add_argument('-b', '--batch-sizes', type=ints, default=(1, 8, 32),
+                        help='comma separated notes predicted in each call')
+    parser.add_argument('-m', '--model-batch-sizes', type=ints,
+                        default=(1, 8),
+                        help='comma separated documents in each model batch')
+    parser.add_argument('-T', '--threads', type=ints, default=(1, 4),
+                        help='comma separated torch CPU thread counts')
+    parser.add_argument('-f', '--filter-types', default='keep_classified',
+                        help='comma separated section filter types')
+    parser.add_argument('-r', '--seed', type=int, default=0,
+                        help='the random seed of the generated notes')
+    parser.add_argument('-i', '--isolate', action='store_true',
+                        help='run each configuration in its own process')
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'),
+                        default=sys.stdout, help='the JSON lines output file')
+    args = parser.parse_args()
+    filter_types: Tuple[SectionFilterType, ...] = tuple(
+        map(lambda n: SectionFilterType[n], args.filter_types.split(',')))
+    bench = Benchmark(
+        note_factory=SyntheticNoteFactory(seed=args.seed),
+        notes=args.notes,
+        sections=args.sections,
+        tokens=args.tokens,
+        batch_sizes=args.batch_sizes,
+        model_batch_sizes=args.model_batch_sizes,
+        threads=args.threads,
+        filter_types=filter_types,
+        isolate=args.isolate)
+    if args.isolate:
+        bench.write(writer=args.output)
+    else:
+        sp: SectionPredictor = create_section_predictor()
+        with dealloc(sp):
+            bench.section_predictor = sp
+            bench.write(writer=args.output)
+
+
+if (__name__ == '__main__'):
+    main()
@@ -1,8 +1,15 @@
 """MIMIC-III corpus parsing and section prediction with MedSecId.
 
+Module attributes are loaded on first access (:pep:`562`) so importing this
+package, or light weight classes such as :class:`.AnnotatedNote`, does not
+import the NLP, deep learning and command line dependencies.
+
 """
 __author__ = 'Paul Landes'
 
+from typing import Dict, Any
+import importlib
+
 
 def suppress_warnings():
     """The pretrained model uses a deprecated API."""
@@ -13,10 +20,26 @@ def suppress_warnings():
     zensols.mednlp.surpress_warnings()
 
 
-suppress_warnings()
+_LAZY_ATTRIBUTES: Dict[str, str] = {
+    **dict.fromkeys(('AnnotationResource', 'NoteStash'), 'anon'),
+    'SectionPredictor': 'pred',
+    'PredictionServer': 'server',
+    **dict.fromkeys(('Application', 'PredOutputType', 'PredictionManifest',
+                     'PredictionSummary', 'CorpusPredictor',
+                     'PredictionApplication'), 'app'),
+    **dict.fromkeys(('ApplicationFactory', 'main'), 'cli'),
+}
+"""The modules of attributes that are not in :mod:`.domain`, which are those
+(at least) previously imported by this package's star imports.
+
+"""
 
 
-from .domain import *
-from .compat import *
-from .app import *
-from .cli import *
+def __getattr__(name: str) -> Any:
+    if not name.startswith('_'):
+        mod_name: str = _LAZY_ATTRIBUTES.get(name, 'domain')
+        mod = importlib.import_module(f'.{mod_name}', __name__)
+        if hasattr(mod, name):
+            # not cached so reloaded modules (see harness.py) are used
+            return getattr(mod, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
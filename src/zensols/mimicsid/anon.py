@@ -8,6 +8,12 @@ from dataclasses import dataclass, field
 import logging
 import json
 import re
+import os
+import sqlite3
+import threading
+import multiprocessing as mp
+from contextlib import closing
+from tempfile import NamedTemporaryFile
 from pathlib import Path
 from io import BytesIO
 from frozendict import frozendict
@@ -15,6 +21,8 @@ import pandas as pd
 from zensols.util import time
 from zensols.config import Dictable
 from zensols.install import Installer
+from zensols.db import ConnectionManager
+from zensols.db.connpool import PooledConnectionManager
 from zensols.persist import (
     persisted, PersistedWork,
     Stash, ReadOnlyStash, ZipStash, PrimeableStash, DelegateStash
@@ -27,6 +35,19 @@ from . import AnnotatedNote
 
 logger = logging.getLogger(__name__)
 
+_WORKER_ADM_STASH: Stash = None
+"""The admission stash inherited from the parent by priming child processes."""
+
+
+def _init_prime_worker(stash: Stash):
+    global _WORKER_ADM_STASH
+    _WORKER_ADM_STASH = stash
+
+
+def _prime_in_worker(hadm_id: str) -> str:
+    _WORKER_ADM_STASH[hadm_id]
+    return hadm_id
+
 
 @dataclass
 class AnnotationResource(Dictable):
@@ -46,6 +67,19 @@ class AnnotationResource(Dictable):
     location to the downloaded file.
 
     """
+    index_path: Path = field(default=None)
+    """The path to a SQLite database compiled from the annotations ``.zip``
+    file on first use (see :meth:`compile_index`).  Annotations and note IDs are
+    then read from the database's indexes rather than the ``.zip`` file.  If
+    ``None``, the ``.zip`` file is used.
+
+    """
+    def __post_init__(self):
+        # each thread (of each process) has its own connection to the index
+        self._index_conns = threading.local()
+        # the annotations are only read, so each is parsed once and shared
+        self._annotations: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+
     @property
     def corpus_path(self) -> Path:
         """The path to the annotations ``.zip`` file (see class docs)."""
@@ -69,18 +103,90 @@ class AnnotationResource(Dictable):
         csv_data: bytearray = self._get_stash().get(self._ONTOLOGY_ENTRY)
         return pd.read_csv(BytesIO(csv_data))
 
+    def compile_index(self):
+        """Compile the annotations ``.zip`` file in to the SQLite database at
+        :obj:`index_path`.  The database has a ``annotation`` table with a row
+        for each note having its admission, note ID, category and annotation
+        JSON indexed by note ID.
+
+        """
+        stash: ZipStash = self._get_stash()
+        path: Path = self.index_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # compile to a file moved in place so readers see a complete database
+        with NamedTemporaryFile(dir=path.parent, suffix='.tmp',
+                                delete=False) as f:
+            tmp_path = Path(f.name)
+        try:
+            with time(f'compiled annotation index: {path}'):
+                with closing(sqlite3.connect(tmp_path)) as conn:
+                    conn.execute(
+                        'create table annotation (hadm_id text, ' +
+                        'row_id text, category text, anon text)')
+                    k: str
+                    for k in stash.keys():
+                        m: re.Match = self._KEY_REGEX.match(k)
+                        if m is not None:
+                            anon: str = stash.get(k).decode('utf-8')
+                            conn.execute(
+                                'insert into annotation values (?, ?, ?, ?)',
+                                (*m.groups(), anon))
+                    conn.execute('create index annotation_row_id ' +
+                                 'on annotation (row_id)')
+                    conn.commit()
+            tmp_path.replace(path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+    @persisted('_index_uri')
+    def _get_index_uri(self) -> str:
+        """Return the read-only URI of the annotation SQLite database, which is
+        compiled (again) if it is missing or older than the ``.zip`` file.
+
+        """
+        self.installer()
+        path: Path = self.index_path
+        if not path.is_file() or \
+           path.stat().st_mtime < self.corpus_path.stat().st_mtime:
+            self.compile_index()
+        return f'file:{path.absolute()}?mode=ro'
+
+    def _get_index_conn(self) -> sqlite3.Connection:
+        """Return the calling thread's connection to the annotation SQLite
+        database, which is opened again in a forked child process since
+        connections can not be used across processes.
+
+        """
+        conns: threading.local = self._index_conns
+        pid: int = os.getpid()
+        if getattr(conns, 'pid', None) != pid:
+            conns.conn = sqlite3.connect(self._get_index_uri(), uri=True)
+            conns.pid = pid
+        return conns.conn
+
+    def _query_index(self, sql: str, params: Tuple[Any, ...] = ()) -> \
+            List[Tuple[Any, ...]]:
+        """Return the rows of a query of the annotation SQLite database."""
+        return self._get_index_conn().execute(sql, params).fetchall()
+
     @property
     @persisted('_note_ids')
     def note_ids(self) -> pd.DataFrame:
         """Return a dataframe of hospital admission and corresponding note IDs.
 
         """
-        rows = []
-        for k in self._get_stash().keys():
-            m: re.Match = self._KEY_REGEX.match(k)
-            if m is not None:
-                rows.append(m.groups())
-        return pd.DataFrame(rows, columns='hadm_id row_id category'.split())
+        cols: List[str] = 'hadm_id row_id category'.split()
+        rows: List[Tuple[str, str, str]]
+        if self.index_path is None:
+            rows = []
+            for k in self._get_stash().keys():
+                m: re.Match = self._KEY_REGEX.match(k)
+                if m is not None:
+                    rows.append(m.groups())
+        else:
+            rows = self._query_index(
+                f'select {", ".join(cols)} from annotation order by rowid')
+        return pd.DataFrame(rows, columns=cols)
 
     @staticmethod
     def category_to_id(name: str) -> str:
@@ -89,15 +195,30 @@ class AnnotationResource(Dictable):
 
     def get_annotation(self, note_event: NoteEvent) -> Dict[str, Any]:
         """Get the raw annotation as Python dict of dics for a
-        :class:`~zensols.mimic.NoteEvent`.
+        :class:`~zensols.mimic.NoteEvent`.  The annotation is shared by all
+        callers, so it must not be modified.
 
         """
         ne = note_event
         cat = self.category_to_id(ne.category)
-        path = f'{self._ANN_ENTRY}/{ne.hadm_id}-{ne.row_id}-{cat}.json'
-        item: bytearray = self._get_stash().get(path)
-        if item is not None:
-            return json.load(BytesIO(item))
+        key: Tuple[str, str, str] = (str(ne.hadm_id), str(ne.row_id), cat)
+        anon: Dict[str, Any] = self._annotations.get(key)
+        if anon is None:
+            if self.index_path is not None:
+                rows: List[Tuple[str]] = self._query_index(
+                    'select anon from annotation where row_id = ? and ' +
+                    'hadm_id = ? and category = ?',
+                    (key[1], key[0], cat))
+                if len(rows) > 0:
+                    anon = json.loads(rows[0][0])
+            else:
+                path = f'{self._ANN_ENTRY}/{ne.hadm_id}-{ne.row_id}-{cat}.json'
+                item: bytearray = self._get_stash().get(path)
+                if item is not None:
+                    anon = json.load(BytesIO(item))
+            if anon is not None:
+                self._annotations[key] = anon
+        return anon
 
     @property
     @persisted('_note_counts_by_admission')
@@ -177,6 +298,18 @@ class AnnotatedNoteStash(ReadOnlyStash, PrimeableStash):
     row_hadm_map_path: Path = field()
     """The path to the note to admission ID mapping cached file."""
 
+    prime_workers: int = field(default=1)
+    """The number of child processes used to create and cache admissions when
+    priming.  If this is less than or equal to 0, the number is subtracted from
+    the CPU count.  Each process opens its own database connections.
+
+    """
+    conn_managers: List[ConnectionManager] = field(default=())
+    """The connection managers of the persisters used to create admissions.
+    Pooled connections are closed before priming across processes so the
+    children do not share them.
+
+    """
     def __post_init__(self):
         super().__post_init__()
         self._row_hadm_map = PersistedWork(
@@ -185,13 +318,56 @@ class AnnotatedNoteStash(ReadOnlyStash, PrimeableStash):
     @property
     @persisted('_row_hadm_map')
     def row_to_hadm_ids(self) -> Dict[str, str]:
-        """A mapping of row to hospital admission IDs."""
+        """A mapping of row to hospital admission IDs, which is also used as the
+        index of this stash's keys.
+
+        """
         with time('calc key diff'):
             df: pd.DataFrame = self.anon_resource.note_ids
             rows: Dict[str, str] = dict(
                 df['row_id hadm_id'.split()].itertuples(index=False))
         return frozendict(rows)
 
+    def _dispose_connections(self):
+        """Close the pooled connections of :obj:`conn_managers`, which would
+        otherwise be inherited by (and shared with) the priming processes.
+
+        """
+        mng: ConnectionManager
+        for mng in self.conn_managers:
+            if isinstance(mng, PooledConnectionManager):
+                mng.dispose_all()
+
+    def _prime_admissions(self, hadm_ids: List[str]):
+        """Create and cache admissions across :obj:`prime_workers` child
+        processes.
+
+        """
+        stash: Stash = self.corpus.hospital_adm_stash
+        workers: int = self.prime_workers
+        if workers <= 0:
+            workers = os.cpu_count() + workers
+        workers = min(workers, len(hadm_ids))
+        if workers <= 1:
+            for hadm_id in hadm_ids:
+                stash[hadm_id]
+            return
+        total: int = len(hadm_ids)
+        report_every: int = max(1, total // 20)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'priming {total} admissions across {workers} workers')
+        self._dispose_connections()
+        with mp.get_context('fork').Pool(
+                workers,
+                initializer=_init_prime_worker,
+                initargs=(stash,)) as pool:
+            n: int
+            for n, _ in enumerate(pool.imap_unordered(
+                    _prime_in_worker, hadm_ids), 1):
+                if logger.isEnabledFor(logging.INFO) and \
+                   (n % report_every == 0 or n == total):
+                    logger.info(f'primed {n}/{total} admissions')
+
     def prime(self):
         stash: Stash = self.corpus.hospital_adm_stash
         df: pd.DataFrame = self.anon_resource.note_ids
@@ -201,8 +377,7 @@ class AnnotatedNoteStash(ReadOnlyStash, PrimeableStash):
             if logger.isEnabledFor(logging.INFO):
                 logger.info(f'priming {len(remaining)} admissions')
             with time(f'wrote {len(remaining)} admissions'):
-                for hadm_id in remaining:
-                    stash[hadm_id]
+                self._prime_admissions(sorted(remaining))
 
     def clear(self):
         self._row_hadm_map.clear()
@@ -221,13 +396,13 @@ class AnnotatedNoteStash(ReadOnlyStash, PrimeableStash):
                                f'{hadm_id}, row_id: {row_id}')
 
     def keys(self) -> Iterable[str]:
-        return self.anon_resource.note_ids['row_id'].tolist()
+        return self.row_to_hadm_ids.keys()
 
     def exists(self, row_id: str) -> bool:
-        return any(self.anon_resource.note_ids['row_id'] == row_id)
+        return row_id in self.row_to_hadm_ids
 
     def __len__(self) -> int:
-        return len(self.anon_resource.note_ids)
+        return len(self.row_to_hadm_ids)
 
 
 @dataclass
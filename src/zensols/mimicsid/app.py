@@ -3,22 +3,34 @@
 """
 __author__ = 'Paul Landes'
 
-from typing import Tuple, List, Dict, Any
+from typing import (
+    Tuple, List, Dict, Set, Any, Iterable, Optional, Union, ClassVar
+)
 from dataclasses import dataclass, field
 from enum import Enum, auto
 import sys
 import logging
+import itertools as it
+import re
+import json
+import hashlib
+from time import time as now
 from io import StringIO, TextIOBase
 from pathlib import Path
 import pandas as pd
 from zensols.util import loglevel, stdout
-from zensols.persist import Stash
-from zensols.config import ConfigFactory
+from zensols.persist import Stash, chunks
+from zensols.config import ConfigFactory, Dictable
 from zensols.cli import ApplicationError
 from zensols.deeplearn.cli import FacadeApplication
-from zensols.mimic import NoteFormat, Note, Corpus, HospitalAdmission
+from zensols.db import cursor
+from zensols.db.sqlite import SqliteConnectionManager
+from zensols.mimic import (
+    NoteFormat, Note, Corpus, HospitalAdmission, NoteEvent, NoteEventPersister
+)
 from .anon import AnnotatedNote, AnnotationResource, NoteStash
 from .pred import SectionPredictor
+from .server import PredictionServer
 from . import PredictedNote
 
 logger = logging.getLogger(__name__)
@@ -160,11 +172,250 @@ class PredOutputType(Enum):
     json = auto()
 
 
+@dataclass
+class PredictionManifest(object):
+    """A record of the notes predicted from files, which is used to skip
+    notes already predicted when resuming a batch prediction job.  Each line
+    of the manifest file is a JSON object with the input file name, the
+    checksum of its contents and the status of the prediction.
+
+    """
+    path: Path = field()
+    """The manifest file."""
+
+    def __post_init__(self):
+        self._done: Dict[str, str] = {}
+        if self.path.is_file():
+            with open(self.path) as f:
+                for line in filter(lambda ln: len(ln.strip()) > 0, f):
+                    entry: Dict[str, str] = json.loads(line)
+                    if entry['status'] == 'ok':
+                        self._done[entry['name']] = entry['checksum']
+                    else:
+                        self._done.pop(entry['name'], None)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f'resuming with {len(self._done)} predicted ' +
+                            f'notes from {self.path}')
+
+    @staticmethod
+    def checksum(text: str) -> str:
+        """Return the checksum of a note's text."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def is_done(self, name: str, checksum: str) -> bool:
+        """Whether the note in file ``name`` with contents having ``checksum``
+        was already predicted.
+
+        """
+        return self._done.get(name) == checksum
+
+    def add(self, name: str, checksum: str, success: bool):
+        """Record the prediction of a note."""
+        status: str = 'ok' if success else 'failed'
+        if success:
+            self._done[name] = checksum
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(
+                {'name': name, 'checksum': checksum, 'status': status}))
+            f.write('\n')
+
+
+@dataclass
+class PredictionSummary(Dictable):
+    """Counts and throughput of a batch prediction job."""
+    processed: int = field(default=0)
+    """The number of notes predicted."""
+
+    skipped: int = field(default=0)
+    """The number of notes skipped since they were already predicted."""
+
+    failed: int = field(default=0)
+    """The number of notes that could not be predicted."""
+
+    elapsed: float = field(default=0)
+    """The number of seconds to predict all notes."""
+
+    @property
+    def throughput(self) -> float:
+        """The number of predicted notes per second."""
+        return 0 if self.elapsed == 0 else self.processed / self.elapsed
+
+    def __str__(self) -> str:
+        return (f'processed: {self.processed}, skipped: {self.skipped}, ' +
+                f'failed: {self.failed}, elapsed: {self.elapsed:.1f}s, ' +
+                f'throughput: {self.throughput:.2f} notes/s')
+
+
+@dataclass
+class CorpusPredictor(object):
+    """Predicts the sections of all MIMIC-III notes, or those of select
+    categories, and writes them as JSON lines in a file for each category.
+    Notes are streamed from the database by category in ``row_id`` order and
+    predicted in batches.  Each line
+    has the note's ``row_id``, ``hadm_id``, ``category`` and sections with
+    their IDs, names, header spans and body span.  The output files are also
+    the checkpoints: notes already in them are skipped when predicting again.
+
+    """
+    note_event_persister: NoteEventPersister = field()
+    """The persister for the ``noteevents`` table."""
+
+    section_predictor: SectionPredictor = field()
+    """Parses (across its ``parse_workers``) and predicts the notes."""
+
+    batch_size: int = field(default=64)
+    """The number of notes to parse and predict at once."""
+
+    report_interval: float = field(default=60)
+    """The number of seconds between logging the throughput."""
+
+    CATEGORY_SQL: ClassVar[str] = \
+        'select {cols} from noteevents where category = {param} order by row_id'
+    """Selects the notes of a category in ``row_id`` order."""
+
+    def _iter_notes(self, category: str, done: Set[int]) -> \
+            Iterable[NoteEvent]:
+        """Stream the notes of ``category`` not in ``done`` from the database.
+
+        """
+        nep: NoteEventPersister = self.note_event_persister
+        cols: List[str] = list(map(
+            str.strip, nep.parser.context['cols'].split(',')))
+        row_ix: int = cols.index('row_id')
+        param: str = '?' if isinstance(
+            nep.conn_manager, SqliteConnectionManager) else '%s'
+        sql: str = self.CATEGORY_SQL.format(cols=', '.join(cols), param=param)
+        with cursor(nep, sql=sql, params=(category,)) as c:
+            row: Tuple[Any, ...]
+            for row in c:
+                if int(row[row_ix]) not in done:
+                    yield nep.row_factory(*row)
+
+    @staticmethod
+    def _category_path(output_path: Path, category: str) -> Path:
+        """Return the output file of the predictions of a category."""
+        name: str = re.sub(r'[^a-z0-9]+', '-', category.lower()).strip('-')
+        return output_path / f'{name}.jsonl'
+
+    @staticmethod
+    def _read_checkpoint(path: Path) -> Set[int]:
+        """Return the IDs of the notes already predicted in ``path``.  A
+        partially written last line (from an interrupted run) is removed.
+
+        """
+        done: Set[int] = set()
+        if path.is_file():
+            with open(path, 'rb+') as f:
+                end: int = 0
+                line: bytes
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    done.add(json.loads(line)['row_id'])
+                    end += len(line)
+                f.truncate(end)
+        return done
+
+    @staticmethod
+    def _to_record(ne: NoteEvent, note: PredictedNote) -> Dict[str, Any]:
+        """Return the JSON output of a predicted note."""
+        return {'row_id': ne.row_id,
+                'hadm_id': ne.hadm_id,
+                'category': ne.category,
+                'sections': list(map(
+                    lambda s: {'id': s.id,
+                               'name': s.name,
+                               'header_spans': list(map(
+                                   lambda h: [h.begin, h.end],
+                                   s.header_spans)),
+                               'body_span': [s.body_span.begin,
+                                             s.body_span.end]},
+                    note.predicted_sections))}
+
+    def _predict_batch(self, events: List[NoteEvent],
+                       summary: PredictionSummary) -> List[str]:
+        """Predict a batch of notes, and if that fails, each note separately.
+
+        :return: the JSON lines of the successfully predicted notes
+
+        """
+        notes: List[Union[PredictedNote, Exception]] = \
+            self.section_predictor.predict_batch(
+                list(map(lambda ne: ne.text, events)), fallback=True)
+        lines: List[str] = []
+        ne: NoteEvent
+        note: Union[PredictedNote, Exception]
+        for ne, note in zip(events, notes):
+            if isinstance(note, Exception):
+                logger.error(f'could not predict {ne.row_id}: {note}')
+                summary.failed += 1
+            else:
+                lines.append(json.dumps(self._to_record(ne, note)) + '\n')
+                summary.processed += 1
+        return lines
+
+    def predict(self, output_path: Path, categories: Set[str] = None,
+                limit: int = None) -> PredictionSummary:
+        """Predict and write the notes' sections.
+
+        :param output_path: the directory of the category output files
+
+        :param categories: the note categories to predict, or ``None`` for all
+
+        :param limit: the maximum number of notes to predict per category
+
+        """
+        summary = PredictionSummary()
+        start: float = now()
+        last_report: float = start
+        output_path.mkdir(parents=True, exist_ok=True)
+        cats: List[str] = sorted(filter(
+            lambda c: categories is None or c in categories,
+            self.note_event_persister.categories))
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'predicting notes in {len(cats)} categories')
+        with self.section_predictor.allocated():
+            cat: str
+            for cat in cats:
+                path: Path = self._category_path(output_path, cat)
+                done: Set[int] = self._read_checkpoint(path)
+                summary.skipped += len(done)
+                events: Iterable[NoteEvent] = self._iter_notes(cat, done)
+                if limit is not None:
+                    events = it.islice(events, max(0, limit - len(done)))
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(f'predicting notes of {cat} ' +
+                                f'({len(done)} done) to {path}')
+                with open(path, 'a') as f:
+                    batch: List[NoteEvent]
+                    for batch in chunks(events, self.batch_size):
+                        f.write(''.join(self._predict_batch(batch, summary)))
+                        f.flush()
+                        if now() - last_report >= self.report_interval:
+                            last_report = now()
+                            summary.elapsed = last_report - start
+                            logger.info(f'progress: {summary}')
+        summary.elapsed = now() - start
+        logger.info(f'corpus prediction summary: {summary}')
+        return summary
+
+
 @dataclass
 class PredictionApplication(object):
     """An application that predicts sections in file(s) on the file system, then
     dumps them back to the file system (or standard out).
 
+    """
+    MANIFEST_NAME: ClassVar[str] = 'predict-manifest.jsonl'
+    """The file name of the :class:`.PredictionManifest` in the output
+    directory used to resume predictions.
+
+    """
+    RESUME_BATCH_SIZE: ClassVar[int] = 64
+    """The number of notes predicted (and recorded in the manifest) at a time
+    when resuming without a batch size.
+
     """
     config_factory: ConfigFactory = field(default=None)
     """The config factory used to help find the packed model."""
@@ -179,10 +430,112 @@ class PredictionApplication(object):
     to create from the ``config_factory``.
 
     """
+    corpus_predictor: CorpusPredictor = field(default=None)
+    """Predicts the sections of the MIMIC-III notes."""
+
+    def _write_prediction(self, path: Path, note: PredictedNote,
+                          output_path: Path, out_type: PredOutputType):
+        """Write the prediction of a note read from ``path``."""
+        ext = 'txt' if out_type == PredOutputType.text else 'json'
+        sio = StringIO()
+        if out_type == PredOutputType.text:
+            note.write_human(writer=sio)
+        else:
+            note.asjson(writer=sio, indent=4)
+        if output_path.name == '-':
+            print(sio.getvalue())
+        else:
+            fpath = output_path / f'{path.stem}-pred.{ext}'
+            fpath.parent.mkdir(parents=True, exist_ok=True)
+            with open(fpath, 'w') as f:
+                f.write(sio.getvalue())
+            logger.info(f'wrote: {fpath}')
+
+    def _predict_paths(self, paths: List[Path], output_path: Path,
+                       out_type: PredOutputType) -> Tuple[PredictedNote]:
+        """Predict and write the notes in ``paths``."""
+        docs: List[str] = []
+        for path in paths:
+            with open(path) as f:
+                docs.append(f.read())
+        notes: Tuple[PredictedNote] = self.section_predictor.predict(docs)
+        for path, note in zip(paths, notes):
+            self._write_prediction(path, note, output_path, out_type)
+        return notes
+
+    def _read_notes(self, paths: Iterable[Path],
+                    manifest: Optional[PredictionManifest],
+                    summary: PredictionSummary) -> \
+            Iterable[Tuple[Path, str, str]]:
+        """Read the files in ``paths`` skipping those already predicted.
+
+        :return: tuples of the path, text and its checksum
+
+        """
+        path: Path
+        for path in paths:
+            with open(path) as f:
+                text: str = f.read()
+            checksum: str = PredictionManifest.checksum(text)
+            if manifest is not None and manifest.is_done(path.name, checksum):
+                summary.skipped += 1
+                continue
+            yield (path, text, checksum)
+
+    def _predict_batch(self, batch: List[Tuple[Path, str, str]],
+                       output_path: Path, out_type: PredOutputType,
+                       manifest: Optional[PredictionManifest],
+                       summary: PredictionSummary):
+        """Predict and write a batch of notes, and then record them in
+        ``manifest``.  When resuming (``manifest`` is given) and the batch
+        fails, each note is predicted separately to find those that fail.
+
+        """
+        notes: List[Union[PredictedNote, Exception]] = \
+            self.section_predictor.predict_batch(
+                list(map(lambda b: b[1], batch)),
+                fallback=manifest is not None)
+        path: Path
+        checksum: str
+        note: Union[PredictedNote, Exception]
+        for (path, _, checksum), note in zip(batch, notes):
+            success: bool = not isinstance(note, Exception)
+            if success:
+                self._write_prediction(path, note, output_path, out_type)
+                summary.processed += 1
+            else:
+                logger.error(f'could not predict {path}: {note}')
+                summary.failed += 1
+            if manifest is not None:
+                manifest.add(path.name, checksum, success)
+
+    def _predict_stream(self, paths: Iterable[Path], output_path: Path,
+                        out_type: PredOutputType, batch_size: int,
+                        manifest: Optional[PredictionManifest],
+                        file_limit: int) -> PredictionSummary:
+        """Predict ``batch_size`` notes at a time writing each batch's output
+        before reading the next.  At most ``file_limit`` notes not yet
+        predicted (per ``manifest``) are predicted.
+
+        """
+        summary = PredictionSummary()
+        start: float = now()
+        with self.section_predictor.allocated():
+            notes: Iterable[Tuple[Path, str, str]] = it.islice(
+                self._read_notes(paths, manifest, summary), file_limit)
+            batch: List[Tuple[Path, str, str]]
+            for batch in chunks(notes, batch_size):
+                self._predict_batch(
+                    batch, output_path, out_type, manifest, summary)
+        summary.elapsed = now() - start
+        logger.info(f'prediction summary: {summary}')
+        return summary
+
     def predict_sections(self, input_path: Path,
                          output_path: Path = Path('preds'),
                          out_type: PredOutputType = PredOutputType.text,
-                         file_limit: int = None):
+                         file_limit: int = None, batch_size: int = None,
+                         resume: bool = False, stats_file: Path = None):
         """Predict the section IDs of a medical notes by file name or all files
         in a directory.
 
@@ -194,40 +547,100 @@ class PredictionApplication(object):
         :param out_type: the prediction output format
 
         :param file_limit: the max number of document to predict when the input
-                           path is a directory
+                           path is a directory, which does not count those
+                           already predicted when resuming
+
+        :param batch_size: if provided, predict and write this many notes at a
+                           time from a directory instead of all at once
+
+        :param resume: skip notes already predicted by a previous invocation
+                       using a manifest kept in the output directory, which
+                       predicts in batches even without ``batch_size``
+
+        :param stats_file: if provided, write the latency of each prediction
+                           stage and the prediction counts as JSON to this file
 
         """
         file_limit = sys.maxsize if file_limit is None else file_limit
+        if not input_path.exists():
+            raise ApplicationError(f'Input path does not exist: {input_path}')
+        paths: List[Path]
         if input_path.is_dir():
-            paths = list(input_path.iterdir())
-            paths = paths[:file_limit]
+            # sort so a resumed run sees the same files in the same order
+            paths = sorted(input_path.iterdir())
             output_path.mkdir(parents=True, exist_ok=True)
         else:
             paths = [input_path]
-        docs: List[str] = []
-        if not input_path.exists():
-            raise ApplicationError(f'Input path does not exist: {input_path}')
-        for path in paths:
-            with open(path) as f:
-                docs.append(f.read())
-        ext = 'txt' if out_type == PredOutputType.text else 'json'
-        notes: Tuple[PredictedNote] = self.section_predictor.predict(docs)
-        for path, note in zip(paths, notes):
-            path = path.parent / f'{path.stem}.{ext}'
-            sio = StringIO()
-            if out_type == PredOutputType.text:
-                note.write_human(writer=sio)
-            else:
-                note.asjson(writer=sio, indent=4)
+        manifest: PredictionManifest = None
+        if resume:
             if output_path.name == '-':
-                print(sio.getvalue())
-            else:
-                fpath = output_path / f'{path.stem}-pred.{ext}'
-                fpath.parent.mkdir(parents=True, exist_ok=True)
-                with open(fpath, 'w') as f:
-                    f.write(sio.getvalue())
-                logger.info(f'wrote: {fpath}')
-        return notes
+                raise ApplicationError(
+                    'Resuming predictions needs an output directory')
+            manifest = PredictionManifest(output_path / self.MANIFEST_NAME)
+            if batch_size is None:
+                # record progress as it goes so an interrupted run resumes
+                batch_size = self.RESUME_BATCH_SIZE
+        ret: Any
+        if batch_size is None:
+            ret = self._predict_paths(
+                paths[:file_limit], output_path, out_type)
+        else:
+            ret = self._predict_stream(
+                paths, output_path, out_type, batch_size, manifest, file_limit)
+        if stats_file is not None:
+            with open(stats_file, 'w') as f:
+                self.section_predictor.stats.asjson(writer=f, indent=4)
+            logger.info(f'wrote: {stats_file}')
+        return ret
+
+    def predict_corpus(self, corpus_path: Path = Path('corpus-preds'),
+                       categories: str = None, corpus_batch_size: int = None,
+                       workers: int = None, limit: int = None) -> \
+            PredictionSummary:
+        """Predict the sections of the MIMIC-III notes by category and write
+        them as JSON lines, skipping those predicted by a previous invocation.
+
+        :param corpus_path: the directory of the category prediction files
+
+        :param categories: a comma-delimited list of the note categories to
+                           predict; defaults to all categories
+
+        :param corpus_batch_size: the number of notes to predict at once
+
+        :param workers: the number of processes used to parse notes
+
+        :param limit: the maximum number of notes to predict per category
+
+        """
+        cp: CorpusPredictor = self.corpus_predictor
+        sp: SectionPredictor = cp.section_predictor
+        if corpus_batch_size is not None:
+            cp.batch_size = corpus_batch_size
+        if workers is not None:
+            sp.parse_workers = workers
+        cats: Set[str] = None
+        if categories is not None:
+            cats = set(map(str.strip, categories.split(',')))
+        return cp.predict(corpus_path, cats, limit)
+
+    def serve(self, host: str = 'localhost', port: int = 8080,
+              max_batch_size: int = 20):
+        """Start a local HTTP server that keeps the models loaded and predicts
+        sections of notes posted to ``/predict``.
+
+        :param host: the interface on which to listen
+
+        :param port: the port on which to listen
+
+        :param max_batch_size: the maximum number of notes to predict at once
+
+        """
+        server = PredictionServer(
+            section_predictor=self.section_predictor,
+            host=host,
+            port=port,
+            max_batch_size=max_batch_size)
+        server.run()
 
     def repredict(self, row_id: int,
                   output_path: Path = Path('preds'),
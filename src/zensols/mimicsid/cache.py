@@ -0,0 +1,195 @@
+"""Caches parsed documents used for prediction and the predictions.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Dict, List, Tuple, Any, Optional
+from dataclasses import dataclass, field
+import logging
+import os
+import hashlib
+from collections import OrderedDict
+from zensols.persist import DirectoryStash
+from zensols.nlp import LexicalSpan, FeatureDocument
+from zensols.mimic import Section
+from .domain import PredictedNote
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ParsedDocumentStash(DirectoryStash):
+    """A content addressed on-disk cache of parsed
+    :class:`~zensols.nlp.container.FeatureDocument` instances.  Keys are
+    created with :meth:`create_key` from a hash of the note text and
+    :obj:`parser_key` so documents are reparsed when the parser configuration
+    changes.  The least recently used documents are removed when more than
+    :obj:`max_entries` are stored.
+
+    """
+    parser_key: str = field(default='')
+    """Identifies the configuration of the parser that creates the cached
+    documents.
+
+    """
+    max_entries: int = field(default=None)
+    """The maximum number of documents to keep, or ``None`` for no limit."""
+
+    def __post_init__(self):
+        super().__post_init__()
+        self.hits: int = 0
+        self.misses: int = 0
+        # keys in least to most recently used order, read from disk once
+        self._lru: Optional[OrderedDict[str, None]] = None
+
+    def create_key(self, text: str) -> str:
+        """Return the key of the document parsed from ``text``."""
+        hasher = hashlib.sha256()
+        hasher.update(self.parser_key.encode('utf-8'))
+        hasher.update(b'\0')
+        hasher.update(text.encode('utf-8'))
+        return hasher.hexdigest()
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """The cache hit and miss counts."""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _get_lru(self) -> OrderedDict[str, None]:
+        """Return the cached keys in least recently used order, which are read
+        from the modification times of the files on first use.  Documents
+        added by other processes afterward are not evicted by this instance.
+
+        """
+        if self._lru is None:
+            keys: List[Tuple[float, str]] = []
+            key: str
+            for key in super().keys():
+                try:
+                    keys.append((self.key_to_path(key).stat().st_mtime, key))
+                except FileNotFoundError:
+                    pass
+            keys.sort()
+            self._lru = OrderedDict.fromkeys(map(lambda k: k[1], keys))
+        return self._lru
+
+    def _evict(self):
+        lru: OrderedDict[str, None] = self._get_lru()
+        removes: int = len(lru) - self.max_entries
+        if removes > 0:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'evicting {removes} cached documents')
+            for _ in range(removes):
+                key: str = lru.popitem(last=False)[0]
+                self.key_to_path(key).unlink(missing_ok=True)
+
+    def load(self, name: str) -> Any:
+        inst: Any = super().load(name)
+        if inst is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            if self.max_entries is not None:
+                lru: OrderedDict[str, None] = self._get_lru()
+                lru[name] = None
+                lru.move_to_end(name)
+                # update the access time used to order a later process's index
+                os.utime(self.key_to_path(name))
+        return inst
+
+    def dump(self, name: str, inst: Any):
+        super().dump(name, inst)
+        if self.max_entries is not None:
+            lru: OrderedDict[str, None] = self._get_lru()
+            lru[name] = None
+            lru.move_to_end(name)
+            self._evict()
+
+    def delete(self, name: str):
+        super().delete(name)
+        if self._lru is not None:
+            self._lru.pop(name, None)
+
+    def clear(self):
+        super().clear()
+        self.hits = 0
+        self.misses = 0
+        self._lru = None
+
+
+@dataclass
+class PredictedSectionStash(DirectoryStash):
+    """An on-disk store of predicted section spans so notes are not predicted
+    again after the cached admissions are cleared.  Keys are created with
+    :meth:`create_key` from the note's ``row_id`` and a hash of its text and
+    :obj:`model_key` so notes are predicted again when the model changes.  Each
+    entry has the ID, name, header spans and body span of each section.
+
+    """
+    model_key: str = field(default='')
+    """Identifies the models (i.e. ``msid_model:version``) that predicted the
+    stored sections.
+
+    """
+    def create_key(self, row_id: int, text: str) -> str:
+        """Return the key of the predicted sections of a note.
+
+        :param row_id: the unique ID of the note
+
+        :param text: the note text, which is stripped of surrounding whitespace
+                     so the raw database text and the parsed document text
+                     (see :class:`~zensols.mimic.persist.NoteDocumentStash`)
+                     have the same key
+
+        """
+        hasher = hashlib.sha256()
+        hasher.update(self.model_key.encode('utf-8'))
+        hasher.update(b'\0')
+        hasher.update(text.strip().encode('utf-8'))
+        return f'{row_id}-{hasher.hexdigest()}'
+
+    def dump_note(self, row_id: int, note: PredictedNote):
+        """Store the predicted sections of a note.
+
+        :param row_id: the unique ID of the note
+
+        :param note: the note with the predicted sections
+
+        """
+        secs: Tuple[Tuple[Any, ...], ...] = tuple(map(
+            lambda s: (s.id, s.name,
+                       tuple(map(lambda h: (h.begin, h.end), s.header_spans)),
+                       (s.body_span.begin, s.body_span.end)),
+            note.predicted_sections))
+        self.dump(self.create_key(row_id, note.text), secs)
+
+    def load_note(self, row_id: int, doc: FeatureDocument) -> \
+            Optional[PredictedNote]:
+        """Return the stored predicted sections of a note.
+
+        :param row_id: the unique ID of the note
+
+        :param doc: the parsed note text
+
+        :return: the predicted note, or ``None`` if it was not stored
+
+        """
+        secs: Tuple[Tuple[Any, ...], ...] = self.load(
+            self.create_key(row_id, doc.text))
+        if secs is not None:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f'restoring {len(secs)} sections of {row_id}')
+            pred_secs: List[Section] = list(map(
+                lambda s: Section(
+                    id=s[0],
+                    name=s[1],
+                    container=None,
+                    header_spans=tuple(map(
+                        lambda h: LexicalSpan(*h), s[2])),
+                    body_span=LexicalSpan(*s[3])),
+                secs))
+            note = PredictedNote(predicted_sections=pred_secs, doc=doc)
+            sec: Section
+            for sec in pred_secs:
+                sec.container = note
+            return note
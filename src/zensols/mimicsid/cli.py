@@ -9,8 +9,13 @@ from zensols.config import ConfigFactory
 from zensols.mimic import Corpus
 from zensols.cli import ActionResult, CliHarness
 from zensols.cli import ApplicationFactory as CliApplicationFactory
+from . import suppress_warnings
 from .anon import NoteStash, AnnotationResource
 from .pred import SectionPredictor
+# patch MedCAT resources created by the application context
+from . import compat  # noqa: F401
+
+suppress_warnings()
 
 
 class ApplicationFactory(CliApplicationFactory):
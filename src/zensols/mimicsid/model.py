@@ -1,23 +1,36 @@
 """Contains section ID model and prediction classes.
 
 """
+from __future__ import annotations
 __author__ = 'Paul Landes'
 
-from typing import Tuple, Type, Any, List, Dict, Optional, ClassVar, Union
+from typing import (
+    Tuple, Type, Any, List, Dict, Optional, ClassVar, Union, Set, Sequence,
+    Iterator
+)
 from dataclasses import dataclass, field
 from enum import Enum, auto
 import logging
+from bisect import bisect_left, bisect_right
+from itertools import compress
+from contextlib import nullcontext, contextmanager
+from concurrent.futures import ThreadPoolExecutor, Future
+import numpy as np
 import pandas as pd
-from zensols.persist import persisted
-from zensols.nlp import FeatureToken, FeatureDocument, LexicalSpan
+from zensols.persist import persisted, PersistableContainer, chunks
+from zensols.nlp import (
+    FeatureToken, FeatureSentence, FeatureDocument, LexicalSpan
+)
 from zensols.mimic import MimicTokenDecorator
-from zensols.deeplearn.batch import DataPoint
-from zensols.deeplearn.result import ResultsContainer
+from zensols.deeplearn.batch import DataPoint, Batch, BatchStash
+from zensols.deeplearn.model import PredictionMapper, ModelExecutor
+from zensols.deeplearn.result import ResultsContainer, ModelResult
 from zensols.deepnlp.classify import (
     ClassificationPredictionMapper, TokenClassifyModelFacade
 )
 from zensols.mimic import Section
 from . import MimicSectionError, AnnotatedNote, AnnotatedSection, PredictedNote
+from .stats import PredictionStats
 
 logger = logging.getLogger(__name__)
 
@@ -62,6 +75,168 @@ class TokenType(Enum):
     MIX = auto()
 
 
+@dataclass
+class SectionTokenFeatures(PersistableContainer):
+    """The token level features of a document used by both the section ID
+    (type) and header models.  Instances are shared by the data points of both
+    models when predicting so the features are created once per document (see
+    :class:`.FusedPredictionEngine`).
+
+    The features are created as columns (one array per feature) in one pass
+    over the document's tokens.  Token types are stored as integer codes that
+    index :obj:`.SectionDataPoint.TOKEN_TYPES`.
+
+    """
+    TOKEN_TYPE_NAMES: ClassVar[np.ndarray] = np.array(
+        tuple(map(lambda t: str(t.name), TokenType)), dtype=object)
+    """The names of the token types indexed by code."""
+
+    HEADER_LABELS: ClassVar[np.ndarray] = np.array(('n', 'y'), dtype=object)
+    """The header labels indexed by whether a token is in a header."""
+
+    doc: FeatureDocument = field()
+    """The parsed document used to create the features."""
+
+    note: AnnotatedNote = field(default=None)
+    """The annotated note used for the labels, or ``None`` when predicting."""
+
+    def __post_init__(self):
+        super().__init__()
+
+    @staticmethod
+    def _get_token_type_codes(norms: np.ndarray, is_sep: np.ndarray,
+                              is_punc: np.ndarray, is_space: np.ndarray) -> \
+            np.ndarray:
+        """Classify tokens as :class:`.TokenType` codes.  Text based types are
+        computed once for each unique normalized token.
+
+        """
+        def code(tt: TokenType) -> int:
+            return tt.value - 1
+
+        uniqs: np.ndarray
+        inv: np.ndarray
+        uniqs, inv = np.unique(norms.astype(str), return_inverse=True)
+        firsts: np.ndarray = uniqs.astype('<U1')
+        text_codes: np.ndarray = np.select(
+            (uniqs == ':',
+             np.char.isupper(uniqs),
+             np.char.islower(uniqs),
+             np.char.isupper(firsts),
+             np.char.isdigit(uniqs)),
+            tuple(map(code, (TokenType.COLON, TokenType.UPCASE,
+                             TokenType.DOWNCASE, TokenType.CAPITAL,
+                             TokenType.DIGIT))),
+            default=code(TokenType.MIX))
+        space_codes: np.ndarray = np.where(
+            np.isin(firsts, ('\n', '\r')),
+            code(TokenType.NEWLINE), code(TokenType.SPACE))
+        text_codes = text_codes[inv]
+        return np.select(
+            (is_sep,
+             text_codes == code(TokenType.COLON),
+             is_punc,
+             is_space),
+            (code(TokenType.SEP),
+             code(TokenType.COLON),
+             code(TokenType.PUNCTUATION),
+             space_codes[inv]),
+            default=text_codes).astype(np.int8)
+
+    def _get_section_labels(self, toks: Tuple[FeatureToken]) -> \
+            Tuple[np.ndarray, np.ndarray]:
+        """Return the section name and whether in a header of each token.  A
+        token is labeled by each (header or body) span of the note's sections
+        it overlaps, inclusively, so later spans take precedence.  Since tokens
+        do not overlap, their begin and end offsets are both sorted, and the
+        tokens of each span are found with a binary search on each.
+
+        """
+        none: str = FeatureToken.NONE
+        n_toks: int = len(toks)
+        # index in to the section names with the last for no section
+        sec_idxs: np.ndarray = np.full(n_toks, -1, dtype=np.int32)
+        is_header: np.ndarray = np.zeros(n_toks, dtype=bool)
+        names: List[str] = []
+        if self.note is not None and n_toks > 0:
+            begins: np.ndarray = np.fromiter(
+                map(lambda t: t.lexspan.begin, toks),
+                dtype=np.int64, count=n_toks)
+            # token spans are treated as closed intervals
+            lasts: np.ndarray = np.fromiter(
+                map(lambda t: t.lexspan.end - 1, toks),
+                dtype=np.int64, count=n_toks)
+            sec: AnnotatedSection
+            for sec in self.note.sections.values():
+                spans: List[Tuple[LexicalSpan, bool]] = list(map(
+                    lambda s: (s, True), sec.header_spans))
+                spans.append((sec.body_span, False))
+                span: LexicalSpan
+                header: bool
+                for span, header in spans:
+                    start: int = np.searchsorted(lasts, span.begin, 'left')
+                    end: int = np.searchsorted(begins, span.end, 'right')
+                    sec_idxs[start:end] = len(names)
+                    is_header[start:end] = header
+                names.append(sec.name)
+        names.append(none)
+        return np.array(names, dtype=object)[sec_idxs], is_header
+
+    @property
+    @persisted('_columns', transient=True)
+    def columns(self) -> Dict[str, np.ndarray]:
+        """The features keyed by name, each as an array with an element for
+        each token.  These are the normalized text (``norm``), section name
+        (``sec_name``), whether in a header (``is_header``), the document
+        character offset (``idx``), token type code (``ttype``), named entity
+        (``ent``) and CUI (``cui``).
+
+        """
+        none: str = FeatureToken.NONE
+        sep: str = MimicTokenDecorator.SEPARATOR_TOKEN_FEATURE
+        mask: str = MimicTokenDecorator.MASK_TOKEN_FEATURE
+        toks: Tuple[FeatureToken] = tuple(self.doc.token_iter())
+        n_toks: int = len(toks)
+        cols: Tuple[Tuple[Any]] = tuple(zip(*map(
+            lambda t: (t.norm, t.idx, t.is_punctuation, t.is_space, t.mimic_,
+                       t.ent_, t.onto_, getattr(t, 'cui_', None)),
+            toks))) if n_toks > 0 else ((),) * 8
+        norms: np.ndarray = np.array(cols[0], dtype=object)
+        idxs: np.ndarray = np.array(cols[1], dtype=np.int64)
+        is_punc: np.ndarray = np.array(cols[2], dtype=bool)
+        is_space: np.ndarray = np.array(cols[3], dtype=bool)
+        mimics: np.ndarray = np.array(cols[4], dtype=object)
+        ents: np.ndarray = np.array(cols[5], dtype=object)
+        # masked tokens use the ontology type when not a named entity
+        is_mask: np.ndarray = (ents == none) & (mimics == mask)
+        ents[is_mask] = np.array(cols[6], dtype=object)[is_mask]
+        cuis: np.ndarray = np.array(cols[7], dtype=object)
+        cuis[cuis == none] = None
+        sec_names: np.ndarray
+        is_header: np.ndarray
+        sec_names, is_header = self._get_section_labels(toks)
+        codes: np.ndarray = self._get_token_type_codes(
+            norms, mimics == sep, is_punc, is_space)
+        return {'norm': norms,
+                'sec_name': sec_names,
+                'is_header': is_header,
+                'idx': idxs,
+                'ttype': codes,
+                'ent': ents,
+                'cui': cuis}
+
+    @property
+    def dataframe(self) -> pd.DataFrame:
+        """A dataframe of the features with the token type and header columns
+        as their string labels.
+
+        """
+        cols: Dict[str, np.ndarray] = dict(self.columns)
+        cols['is_header'] = self.HEADER_LABELS[cols['is_header'].astype(int)]
+        cols['ttype'] = self.TOKEN_TYPE_NAMES[cols['ttype']]
+        return pd.DataFrame(cols)
+
+
 @dataclass
 class SectionDataPoint(DataPoint):
     """A data point for the section ID model.
@@ -80,6 +255,11 @@ class SectionDataPoint(DataPoint):
     """The parsed document used for prediction when using this data point for
     prediction.
 
+    """
+    token_features: SectionTokenFeatures = field(default=None, repr=False)
+    """The features used to create those of this data point, which are created
+    from :obj:`doc` if not provided.
+
     """
     def __post_init__(self):
         if self.note is not None:
@@ -96,83 +276,38 @@ class SectionDataPoint(DataPoint):
         return self.pred_doc if self.is_pred else self.note.doc
 
     @property
-    @persisted('_features', transient=True)
+    def feature_columns(self) -> Dict[str, np.ndarray]:
+        """The features used to create those of this data point (see
+        :obj:`.SectionTokenFeatures.columns`).
+
+        """
+        if self.token_features is None:
+            self.token_features = SectionTokenFeatures(self.doc, self.note)
+        return self.token_features.columns
+
+    @property
     def feature_dataframe(self) -> pd.DataFrame:
         """A dataframe used to create some of the features of this data point.
 
         """
-        rows: List[Tuple[Any]] = []
-        tok2sec: Dict[FeatureToken, Section] = None
-        if self.note is not None:
-            tok2sec = {}
-            sec: AnnotatedSection
-            for sec in self.note.sections.values():
-                for tok in sec.header_tokens:
-                    tok2sec[tok] = (sec, True)
-                for tok in sec.body_tokens:
-                    tok2sec[tok] = (sec, False)
-        tok: FeatureToken
-        for tok in self.doc.token_iter():
-            entry: Optional[Tuple[Section, bool]] = None
-            if tok2sec is not None:
-                entry = tok2sec.get(tok)
-            if entry is None:
-                sec_name, is_header = FeatureToken.NONE, False
-            else:
-                sec_name, is_header = entry[0].name, entry[1]
-            tt: TokenType
-            norm: str = tok.norm
-            ent: str = FeatureToken.NONE
-            cui: Optional[str] = tok.cui_ if hasattr(tok, 'cui_') else None
-            header_lab: str = 'y' if is_header else 'n'
-            if cui == FeatureToken.NONE:
-                cui = None
-            if tok.ent_ != FeatureToken.NONE:
-                ent = tok.ent_
-            elif tok.mimic_ == MimicTokenDecorator.MASK_TOKEN_FEATURE:
-                ent = tok.onto_
-            if tok.mimic_ == MimicTokenDecorator.SEPARATOR_TOKEN_FEATURE:
-                tt = TokenType.SEP
-            elif norm == ':':
-                tt = TokenType.COLON
-            elif tok.is_punctuation:
-                tt = TokenType.PUNCTUATION
-            elif tok.is_space:
-                tt = {' ': TokenType.SPACE,
-                      '\t': TokenType.SPACE,
-                      '\n': TokenType.NEWLINE,
-                      '\r': TokenType.NEWLINE,
-                      }[norm[0]]
-            else:
-                if norm.isupper():
-                    tt = TokenType.UPCASE
-                elif norm.islower():
-                    tt = TokenType.DOWNCASE
-                elif norm[0].isupper():
-                    tt = TokenType.CAPITAL
-                elif norm.isdigit():
-                    tt = TokenType.DIGIT
-                else:
-                    tt = TokenType.MIX
-            ts = tt.name
-            rows.append((tok.norm, sec_name, header_lab, tok.idx, ts, ent, cui))
-        return pd.DataFrame(
-            rows, columns='norm sec_name is_header idx ttype ent cui'.split())
+        self.feature_columns
+        return self.token_features.dataframe
 
     @property
     def section_names(self) -> Tuple[str]:
         """The section names label (section types per the paper)."""
-        return tuple(self.feature_dataframe['sec_name'])
+        return tuple(self.feature_columns['sec_name'])
 
     @property
     def headers(self) -> Tuple[str]:
         """The header label (section types per the paper)."""
-        return tuple(self.feature_dataframe['is_header'])
+        is_header: np.ndarray = self.feature_columns['is_header']
+        return tuple(SectionTokenFeatures.HEADER_LABELS[is_header.astype(int)])
 
     @property
     def idxs(self) -> Tuple[int]:
         """The index feature."""
-        return tuple(self.feature_dataframe['idx'])
+        return tuple(self.feature_columns['idx'].tolist())
 
     @property
     def ttypes(self) -> Tuple[str]:
@@ -180,17 +315,18 @@ class SectionDataPoint(DataPoint):
         :class:`.TokenType`.
 
         """
-        return tuple(self.feature_dataframe['ttype'])
+        codes: np.ndarray = self.feature_columns['ttype']
+        return tuple(SectionTokenFeatures.TOKEN_TYPE_NAMES[codes])
 
     @property
     def ents(self) -> Tuple[str]:
         """The named entity feature."""
-        return tuple(self.feature_dataframe['ent'])
+        return tuple(self.feature_columns['ent'])
 
     @property
     def cuis(self) -> Tuple[Optional[str]]:
         """The CUI feature."""
-        return tuple(self.feature_dataframe['cui'])
+        return tuple(self.feature_columns['cui'])
 
     def __len__(self):
         return self.doc.token_len
@@ -203,102 +339,109 @@ class SectionPredictionMapper(ClassificationPredictionMapper):
     of type :class:`.SectionDataPoint` that are used by the model.
 
     """
-    def _create_tok_list(self, doc: FeatureDocument, labels: Tuple[str],
-                         tok_lists: List[Tuple[str, List[FeatureToken]]]):
-        """Create token lists for each document.  This coallates a section label
-        with the respective list of tokens from which they were predicted.
-
-        :param doc: the document used for prediction
-
-        :param labels: the predicted labels for ``doc``
-
-        :tok_lists: the coallated label/token list to populate
+    batch_size: int = field(default=1)
+    """The number of data points (documents or their windows) to predict in
+    each batch.  When greater than one, data points are sorted by token length
+    so those in the same batch have similar lengths, which minimizes padding.
+    Predictions are returned in the order the documents were given regardless
+    of this setting.
 
-        """
-        def add_tok_list(lab: str, tok_list: List[FeatureToken]):
-            """Strip front and back newlines."""
-            for beg, tok in enumerate(tok_list):
-                if tok.norm != '\n':
-                    break
-            for end, tok in enumerate(reversed(tok_list)):
-                if tok.norm != '\n':
-                    break
-            end = len(tok_list) - end
-            tok_lists.append((lab, tok_list[beg:end]))
-
-        tok_list: List[FeatureToken] = None
-        last_lab: str = None
-        label: str
-        tok: FeatureToken
-        for label, tok in zip(labels, doc.token_iter()):
-            if tok.is_space:
-                continue
-            if last_lab != label:
-                if tok_list is not None:
-                    add_tok_list(last_lab, tok_list)
-                tok_list = [tok]
-            else:
-                tok_list.append(tok)
-            last_lab = label
-        if tok_list is not None and len(tok_list) > 0:
-            add_tok_list(last_lab, tok_list)
+    """
+    window_size: int = field(default=None)
+    """The maximum number of tokens predicted as one sequence, or ``None`` to
+    predict each document as a whole.  Longer documents are split in to
+    overlapping windows that end at sentence or newline boundaries when
+    possible, and the labels of the windows are stitched back together.
 
-    def _create_sections(self, tok_lists: Tuple[str, List[FeatureToken]],
-                         doc: FeatureDocument, secs: List[AnnotatedSection]):
-        """Create sections from token lists.
+    """
+    window_overlap: int = field(default=0)
+    """The number of tokens shared by consecutive windows (see
+    :obj:`window_size`).  The first half of the shared tokens take the labels
+    of the earlier window and the rest take those of the later window.
 
-        :param tok_lists: the token lists created in :meth:`_create_tok_list`
+    """
+    def __post_init__(self):
+        super().__post_init__()
+        # the document index, token begin and token end of each feature
+        self._feature_spans: List[Tuple[int, int, int]] = []
+        # the feature indexes of each batch
+        self._batch_feature_idxs: List[Tuple[int]] = None
+
+    def _create_sections(self, doc: FeatureDocument, labels: np.ndarray,
+                         secs: List[AnnotatedSection]):
+        """Create sections from the runs of the same predicted label of a
+        document's (non-space) tokens.  Run boundaries are found with run-length
+        encoding on the label IDs, which are decoded to section names once for
+        each run.
 
         :param doc: the document used for prediction
 
+        :param labels: the predicted label IDs for each token of ``doc``
+
         :param secs: the list to populate with creeated sections
 
         """
-        # remove token lists with no classified section
-        tok_lists = tuple(
-            filter(lambda x: x[0] != FeatureToken.NONE, tok_lists))
-        for sid, (label, toks) in enumerate(tok_lists):
-            span: LexicalSpan = None
-            if len(toks) == 0:
+        toks: Tuple[FeatureToken] = tuple(doc.token_iter())
+        # space tokens neither belong to nor split sections
+        keeps: np.ndarray = np.array(
+            [not t.is_space for t in toks], dtype=bool)
+        keep_toks: List[FeatureToken] = list(compress(toks, keeps))
+        if len(keep_toks) == 0:
+            return
+        labels = labels[keeps]
+        starts: np.ndarray = np.concatenate(
+            ((0,), np.flatnonzero(labels[1:] != labels[:-1]) + 1))
+        ends: np.ndarray = np.append(starts[1:], len(labels))
+        names: np.ndarray = np.asarray(
+            self.label_vectorizer.get_classes(labels[starts]), dtype=object)
+        sid: int = 0
+        start: int
+        end: int
+        name: str
+        for start, end, name in zip(starts.tolist(), ends.tolist(), names):
+            if name == FeatureToken.NONE:
+                # skip tokens with no classified section
+                continue
+            # strip front and back newlines
+            begin: int = start
+            while begin < end and keep_toks[begin].norm == '\n':
+                begin += 1
+            if begin < end:
+                while keep_toks[end - 1].norm == '\n':
+                    end -= 1
+                start = begin
+            elif end - start > 1:
                 # bail past deep framework and handled higher in the stack
                 raise EmptyPredictionError()
-            elif len(toks) == 1:
-                span = toks[0].lexspan
+            span: LexicalSpan
+            if end - start == 1:
+                span = keep_toks[start].lexspan
             else:
-                begin = toks[0].lexspan.begin
-                end = toks[-1].lexspan.end
-                span = LexicalSpan(begin, end)
-            assert span is not None
+                span = LexicalSpan(
+                    keep_toks[start].lexspan.begin,
+                    keep_toks[end - 1].lexspan.end)
             secs.append(Section(
                 id=sid,
-                name=label,
+                name=name,
                 container=None,
                 header_spans=(),
                 body_span=span))
+            sid += 1
 
     def _collate(self, docs: Tuple[FeatureDocument],
-                 classes: Tuple[Tuple[str]]) -> List[PredictedNote]:
+                 classes: Tuple[np.ndarray]) -> List[PredictedNote]:
         """Collate predictions with feature tokens.
 
         :param docs: he documents used for prediction
 
-        :param classes: the predicted classes
+        :param classes: the predicted label IDs of each document's tokens
         """
         notes: List[PredictedNote] = []
-        doc_tok_lists: List[Tuple[str, List[FeatureToken]]] = []
-        # create token lists that have the section label with respective tokens
-        labels: List[str]
+        labels: np.ndarray
         doc: FeatureDocument
         for labels, doc in zip(classes, docs):
-            tok_lists: List[Tuple[str, List[FeatureToken]]] = []
-            doc_tok_lists.append(tok_lists)
-            self._create_tok_list(doc, labels, tok_lists)
-        # create predicted notes
-        tok_lists: Tuple[str, List[FeatureToken]]
-        doc: FeatureDocument
-        for doc, tok_lists in zip(docs, doc_tok_lists):
             secs: List[AnnotatedSection] = []
-            self._create_sections(tok_lists, doc, secs)
+            self._create_sections(doc, labels, secs)
             pn = PredictedNote(
                 predicted_sections=secs,
                 doc=doc)
@@ -308,21 +451,174 @@ class SectionPredictionMapper(ClassificationPredictionMapper):
             notes.append(pn)
         return notes
 
-    def _create_features(self, data: Union[FeatureDocument, str]) -> \
-            Tuple[FeatureDocument]:
-        if isinstance(data, FeatureDocument):
-            self._docs.append(data)
-            return [data]
+    def _get_window_spans(self, doc: FeatureDocument) -> \
+            List[Tuple[int, int]]:
+        """Return the token begin and end of each window of ``doc``."""
+        tok_len: int = doc.token_len
+        size: int = self.window_size
+        if size is None or tok_len <= size:
+            return [(0, tok_len)]
+        overlap: int = min(self.window_overlap, size // 2)
+        # token indexes at which a window can end
+        bounds: List[int] = []
+        pos: int = 0
+        sent: FeatureSentence
+        for sent in doc.sents:
+            tok: FeatureToken
+            for tok in sent.token_iter():
+                pos += 1
+                if tok.is_space and '\n' in tok.norm:
+                    bounds.append(pos)
+            if len(bounds) == 0 or bounds[-1] != pos:
+                bounds.append(pos)
+        spans: List[Tuple[int, int]] = []
+        begin: int = 0
+        while tok_len - begin > size:
+            # end at the last boundary that fits in the window if it leaves
+            # room to advance past the overlap, otherwise split a sentence
+            i: int = bisect_right(bounds, begin + size) - 1
+            end: int = bounds[i] if i >= 0 and bounds[i] > begin + overlap \
+                else begin + size
+            spans.append((begin, end))
+            if overlap == 0:
+                begin = end
+            else:
+                # start the next window at a boundary in the overlap
+                i = bisect_left(bounds, end - overlap)
+                begin = bounds[i] if bounds[i] < end else end - overlap
+        spans.append((begin, tok_len))
+        return spans
+
+    def _create_window(self, doc: FeatureDocument,
+                       begin: int, end: int) -> FeatureDocument:
+        """Create a document with the tokens of ``doc`` from token index
+        ``begin`` to ``end`` keeping any sentences it splits.
+
+        """
+        sents: List[FeatureSentence] = []
+        pos: int = 0
+        sent: FeatureSentence
+        for sent in doc.sents:
+            toks: Tuple[FeatureToken] = tuple(sent.token_iter())
+            sbeg: int = max(begin - pos, 0)
+            send: int = min(end - pos, len(toks))
+            if sbeg < send:
+                sents.append(FeatureSentence(tokens=toks[sbeg:send]))
+            pos += len(toks)
+        return FeatureDocument(sents=tuple(sents))
+
+    def _create_features(self, data: Union[FeatureDocument, str,
+                                           SectionTokenFeatures]) -> \
+            Tuple[Union[FeatureDocument, SectionTokenFeatures]]:
+        doc: FeatureDocument
+        if isinstance(data, SectionTokenFeatures):
+            doc = data.doc
+        elif isinstance(data, FeatureDocument):
+            doc = data
         else:
-            return super()._create_features(data)
+            doc = self.vec_manager.parse(data)
+            data = doc
+        doc_idx: int = len(self._docs)
+        self._docs.append(doc)
+        spans: List[Tuple[int, int]] = self._get_window_spans(doc)
+        self._feature_spans.extend(map(lambda s: (doc_idx, *s), spans))
+        if len(spans) == 1:
+            return [data]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'split document of {doc.token_len} tokens in ' +
+                         f'{len(spans)} windows')
+        return list(map(lambda s: self._create_window(doc, *s), spans))
 
     def _create_data_point(self, cls: Type[DataPoint],
                            feature: Any) -> DataPoint:
+        if isinstance(feature, SectionTokenFeatures):
+            return cls(None, self.batch_stash, note=None,
+                       pred_doc=feature.doc, token_features=feature)
         return cls(None, self.batch_stash, note=None, pred_doc=feature)
 
+    def _create_batches(self) -> List[Batch]:
+        bcls: Type[Batch] = self.batch_stash.batch_type
+        dpcls: Type[DataPoint] = self.batch_stash.data_point_type
+        features: List[Any] = []
+        data: Any
+        for data in self.datas:
+            features.extend(self._create_features(data))
+        spans: List[Tuple[int, int, int]] = self._feature_spans
+        idxs: Sequence[int] = range(len(features))
+        if self.batch_size > 1:
+            # bucket data points of similar length
+            idxs = sorted(idxs, key=lambda i: spans[i][2] - spans[i][1])
+        self._batch_feature_idxs = list(map(
+            tuple, chunks(idxs, max(self.batch_size, 1))))
+        batches: List[Batch] = []
+        batch_idxs: Tuple[int]
+        for batch_idxs in self._batch_feature_idxs:
+            dps: Tuple[DataPoint] = tuple(map(
+                lambda i: self._create_data_point(dpcls, features[i]),
+                batch_idxs))
+            batch: Batch = self.batch_stash.create_batch(dps)
+            dec_batch: Batch = object.__new__(bcls)
+            dec_batch.__setstate__(batch.__getstate__())
+            dec_batch.batch_stash = self.batch_stash
+            dec_batch.data_points = batch.data_points
+            batches.append(dec_batch)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'created {len(batches)} batches from ' +
+                         f'{len(features)} data points')
+        return batches
+
+    def _share_batches(self, mapper: SectionPredictionMapper):
+        """Use the documents and batches created by ``mapper`` to map the
+        results of predicting its batches (see :class:`.FusedPredictionEngine`).
+
+        """
+        self._docs.extend(mapper._docs)
+        self._feature_spans = mapper._feature_spans
+        self._batch_feature_idxs = mapper._batch_feature_idxs
+
+    def _stitch_classes(self, classes: Sequence[np.ndarray]) -> \
+            Tuple[np.ndarray]:
+        """Split the predicted label IDs of each batch by data point, then
+        stitch the labels of each document's windows in the original document
+        order.
+
+        """
+        spans: List[Tuple[int, int, int]] = self._feature_spans
+        doc_pieces: List[List[np.ndarray]] = [[] for _ in self._docs]
+        doc_lens: List[int] = [0] * len(self._docs)
+        feature_classes: List[np.ndarray] = [None] * len(spans)
+        batch_idxs: Tuple[int]
+        labels: np.ndarray
+        for batch_idxs, labels in zip(self._batch_feature_idxs, classes):
+            start: int = 0
+            i: int
+            for i in batch_idxs:
+                end: int = start + spans[i][2] - spans[i][1]
+                feature_classes[i] = labels[start:end]
+                start = end
+        doc_idx: int
+        begin: int
+        for (doc_idx, begin, _), labels in zip(spans, feature_classes):
+            pieces: List[np.ndarray] = doc_pieces[doc_idx]
+            # split the overlap with the previous window at its midpoint
+            mid: int = begin + ((doc_lens[doc_idx] - begin) // 2)
+            cut: int = doc_lens[doc_idx] - mid
+            while cut > 0:
+                last: np.ndarray = pieces.pop()
+                if len(last) > cut:
+                    pieces.append(last[:len(last) - cut])
+                cut -= len(last)
+            pieces.append(labels[mid - begin:])
+            doc_lens[doc_idx] = begin + len(labels)
+        return tuple(map(
+            lambda p: p[0] if len(p) == 1 else np.concatenate(p)
+            if len(p) > 0 else np.empty(0, dtype=np.int64),
+            doc_pieces))
+
     def map_results(self, result: ResultsContainer) -> List[PredictedNote]:
         docs: Tuple[FeatureDocument] = tuple(self._docs)
-        classes: Tuple[Tuple[str]] = tuple(self._map_classes(result))
+        classes: Tuple[np.ndarray] = self._stitch_classes(
+            tuple(map(np.asarray, result.batch_predictions)))
         return self._collate(docs, classes)
 
 
@@ -337,3 +633,183 @@ class SectionFacade(TokenClassifyModelFacade):
         super()._configure_cli_logging(info_loggers, debug_loggers)
         if not self.progress_bar:
             info_loggers.append('zensols.install')
+
+
+@dataclass
+class FusedPredictionEngine(object):
+    """Predicts with both the section ID (type) and header models while
+    creating the features they have in common only once.  The token features
+    (:class:`.SectionTokenFeatures`) are always shared.  When both models
+    decode the same batch attributes (other than their labels), such as when
+    they use the same word embeddings, batches are vectorized once and given to
+    both networks.  Otherwise, each facade vectorizes its own batches.
+
+    """
+    section_facade: SectionFacade = field()
+    """The section ID (type) model facade."""
+
+    header_facade: Optional[SectionFacade] = field()
+    """The header token model facade, or ``None`` to only predict with
+    :obj:`section_facade` (see :meth:`predict_sections`).
+
+    """
+    fuse: bool = field(default=True)
+    """Whether to share features between models.  If ``False``, each facade
+    predicts independently."""
+
+    concurrent: bool = field(default=False)
+    """Whether to predict using a thread per model when batches are not shared.
+
+    """
+    stats: Optional[PredictionStats] = field(default=None)
+    """If set, the vectorization, forward pass and decoding stages are timed."""
+
+    def _time(self, stage: str):
+        return nullcontext() if self.stats is None else self.stats.time(stage)
+
+    @contextmanager
+    def _predicting(self, *facades: SectionFacade) -> Iterator[None]:
+        """Notify the observers of ``facades`` of a prediction as
+        :meth:`.ModelFacade.predict` does.
+
+        """
+        fac: SectionFacade
+        for fac in facades:
+            fac._notify('predict_start')
+        try:
+            yield
+        finally:
+            for fac in facades:
+                fac._notify('predict_end')
+
+    @staticmethod
+    def _get_label_attribute(stash: BatchStash) -> str:
+        return stash.batch_feature_mappings.label_attribute_name
+
+    def _get_shared_attributes(self, facade: SectionFacade) -> Set[str]:
+        stash: BatchStash = facade.batch_stash
+        return set(stash.decoded_attributes) - \
+            {self._get_label_attribute(stash)}
+
+    @property
+    def shares_vectorization(self) -> bool:
+        """Whether the batches of the section ID model can be used as input to
+        the header model.
+
+        """
+        return self._get_shared_attributes(self.section_facade) == \
+            self._get_shared_attributes(self.header_facade)
+
+    def _create_mapper(self, facade: SectionFacade,
+                       datas: Sequence[Any]) -> PredictionMapper:
+        return facade.config_factory.new_instance(
+            facade.model_settings.prediction_mapper_name,
+            datas, facade.batch_stash)
+
+    def _predict_batches(self, facade: SectionFacade,
+                         batches: List[Batch]) -> ResultsContainer:
+        executor: ModelExecutor = facade.executor
+        if not executor.model_exists:
+            executor.load()
+        res: ModelResult = executor.predict(batches)
+        return res.results[0]
+
+    def _predict_shared(self, docs: Tuple[FeatureDocument]) -> \
+            Tuple[List[PredictedNote], List[PredictedNote]]:
+        """Vectorize batches once and predict with both models."""
+        hstash: BatchStash = self.header_facade.batch_stash
+        spm: SectionPredictionMapper = self._create_mapper(
+            self.section_facade, docs)
+        hpm: SectionPredictionMapper = self._create_mapper(
+            self.header_facade, docs)
+        try:
+            with self._predicting(self.section_facade, self.header_facade):
+                with self._time('vectorize'):
+                    batches: List[Batch] = spm.batches
+                with self._time('section_forward'):
+                    sres: ResultsContainer = self._predict_batches(
+                        self.section_facade, batches)
+                # the header model expects its (missing) prediction label
+                label_attr: str = self._get_label_attribute(hstash)
+                batch: Batch
+                for batch in batches:
+                    batch.attributes.setdefault(label_attr, None)
+                with self._time('header_forward'):
+                    hres: ResultsContainer = self._predict_batches(
+                        self.header_facade, batches)
+                hpm._share_batches(spm)
+                with self._time('section_decode'):
+                    snotes: List[PredictedNote] = spm.map_results(sres)
+                with self._time('header_decode'):
+                    hnotes: List[PredictedNote] = hpm.map_results(hres)
+                return snotes, hnotes
+        finally:
+            spm.deallocate()
+            hpm.deallocate()
+
+    def _predict_facade(self, facade: SectionFacade, name: str,
+                        datas: Sequence[Any]) -> List[PredictedNote]:
+        """Predict with one facade as :meth:`.ModelFacade.predict` does, and
+        time each stage prefixed with ``name``.
+
+        """
+        pm: SectionPredictionMapper = self._create_mapper(facade, datas)
+        try:
+            with self._predicting(facade):
+                with self._time(f'{name}_vectorize'):
+                    batches: List[Batch] = pm.batches
+                with self._time(f'{name}_forward'):
+                    res: ResultsContainer = self._predict_batches(
+                        facade, batches)
+                with self._time(f'{name}_decode'):
+                    return pm.map_results(res)
+        finally:
+            pm.deallocate()
+
+    def _predict_facades(self, datas: Tuple[Any]) -> \
+            Tuple[List[PredictedNote], List[PredictedNote]]:
+        """Predict with each facade vectorizing its own batches."""
+        sfac: SectionFacade = self.section_facade
+        hfac: SectionFacade = self.header_facade
+        if self.concurrent:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                sfut: Future = pool.submit(
+                    self._predict_facade, sfac, 'section', datas)
+                hfut: Future = pool.submit(
+                    self._predict_facade, hfac, 'header', datas)
+                return sfut.result(), hfut.result()
+        else:
+            return (self._predict_facade(sfac, 'section', datas),
+                    self._predict_facade(hfac, 'header', datas))
+
+    def predict_sections(self, docs: Tuple[FeatureDocument]) -> \
+            List[PredictedNote]:
+        """Predict sections with only the section ID (type) model.
+
+        :param docs: the parsed documents to predict
+
+        """
+        return self._predict_facade(self.section_facade, 'section', docs)
+
+    def predict(self, docs: Tuple[FeatureDocument]) -> \
+            Tuple[List[PredictedNote], List[PredictedNote]]:
+        """Predict sections with both models.
+
+        :param docs: the parsed documents to predict
+
+        :return: the section ID and header model predictions respectively
+
+        """
+        if not self.fuse:
+            return self._predict_facades(docs)
+        if self.shares_vectorization:
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('sharing batches across models')
+            return self._predict_shared(docs)
+        feats: Tuple[SectionTokenFeatures] = tuple(
+            map(SectionTokenFeatures, docs))
+        # create features before threads (if any) can duplicate the work
+        feat: SectionTokenFeatures
+        for feat in feats:
+            feat.columns
+        return self._predict_facades(feats)
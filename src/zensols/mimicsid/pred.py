@@ -3,24 +3,56 @@
 """
 from __future__ import annotations
 __author__ = 'Paul Landes'
-from typing import List, Tuple, Optional, Iterable, Set, Union, Callable
+from typing import (
+    List, Tuple, Dict, Optional, Iterable, Set, Union, Callable, Sequence,
+    Iterator, AsyncIterator, ClassVar, Any
+)
 from dataclasses import dataclass, field, InitVar
 import logging
+import os
+import math
+import queue
+import asyncio
+import threading
+import multiprocessing as mp
+from time import monotonic
+from contextlib import contextmanager
+from multiprocessing.pool import Pool
+from concurrent.futures import (
+    Future, Executor, ThreadPoolExecutor, InvalidStateError
+)
 from zensols.config import ConfigFactory, Configurable
 from zensols.persist import (
-    PersistableContainer, persisted, PersistedWork, Primeable
+    PersistableContainer, persisted, PersistedWork, Primeable, chunks
 )
 from zensols.nlp import LexicalSpan, FeatureDocument, FeatureDocumentParser
 from zensols.deeplearn.model import ModelUnpacker, ModelFacade
 from zensols.mimic import (
-    Section, NoteEvent, Note, SectionContainer, GapSectionContainer
+    Section, NoteEvent, Note, SectionContainer, GapSectionContainer,
+    NoteEventPersister
 )
 from . import SectionFilterType, PredictedNote, MimicPredictedNote
 from .anon import AnnotationNoteFactory
-from .model import PredictionError, EmptyPredictionError, SectionFacade
+from .cache import ParsedDocumentStash, PredictedSectionStash
+from .stats import PredictionStats
+from .model import (
+    PredictionError, EmptyPredictionError, SectionFacade, FusedPredictionEngine
+)
 
 logger = logging.getLogger(__name__)
 
+_WORKER_DOC_PARSER: FeatureDocumentParser = None
+"""The parser inherited from the parent by document parsing child processes."""
+
+
+def _init_parse_worker(doc_parser: FeatureDocumentParser):
+    global _WORKER_DOC_PARSER
+    _WORKER_DOC_PARSER = doc_parser
+
+
+def _parse_in_worker(text: str) -> FeatureDocument:
+    return _WORKER_DOC_PARSER(text)
+
 
 @dataclass
 class SectionPredictor(PersistableContainer, Primeable):
@@ -36,7 +68,35 @@ class SectionPredictor(PersistableContainer, Primeable):
     deallocation.  Their deallocation logic is invoked with this instance and
     deallocated by :class:`~zensols.persist.annotation.PersistableContainer`.
 
+    Classes that predict with an instance for their lifetime, such as
+    :class:`.BatchingSectionPredictor`, :class:`.AsyncSectionPredictor` and
+    :class:`~zensols.mimicsid.server.PredictionServer`, own it: they set
+    :obj:`auto_deallocate` to ``False`` when created so the models are kept
+    between predictions, then restore it and deallocate the instance when they
+    are deallocated.
+
     """
+    WARM_UP_NOTE: ClassVar[str] = """\
+Admission Date:  [**2151-7-16**]       Discharge Date:  [**2151-8-4**]
+
+Chief Complaint:
+Shortness of breath
+
+History of Present Illness:
+Patient is a 64 year old male with a history of hypertension who presented
+with two days of worsening dyspnea and a productive cough.
+
+Medications on Admission:
+1. Lisinopril 10 mg PO daily
+
+Discharge Diagnosis:
+Community acquired pneumonia
+
+Discharge Condition:
+Good
+"""
+    """The synthetic note predicted by :meth:`warm_up`."""
+
     name: str = field()
     """The name of this object instance definition in the configuration."""
 
@@ -68,10 +128,54 @@ class SectionPredictor(PersistableContainer, Primeable):
     """Whether or not to deallocate resources after every call to
     :meth:`predict`.  See class docs.
 
+    """
+    concurrent_models: bool = field(default=False)
+    """Whether to run the section ID (type) and header models at the same
+    time in separate threads.  Both models read the same parsed documents, so
+    the header model's predictions are merged after both finish.
+
+    """
+    fuse_models: bool = field(default=False)
+    """Whether to create the features common to both the section ID (type) and
+    header models only once per batch.  See
+    :class:`~zensols.mimicsid.model.FusedPredictionEngine`.
+
+    """
+    doc_cache: Optional[ParsedDocumentStash] = field(default=None)
+    """If set, used to cache documents parsed by :meth:`predict` so notes
+    already seen are not parsed again.
+
+    """
+    parse_workers: int = field(default=1)
+    """The number of processes used to parse documents in :meth:`predict`.  If
+    1, parse in this process.  If less than 1, the number of CPUs plus this
+    value is used.  The parser is created in this process and inherited by the
+    (forked) children, which return the parsed documents in the order given.
+
+    The pool of processes is created on first use, or by
+    :meth:`create_parse_pool`, and kept until :meth:`deallocate`.  It is only
+    created in the main thread because forking a process with other running
+    threads can deadlock on locks they hold, so documents are parsed in this
+    process when predicting in other threads before the pool exists.
+
+    """
+    prime_warm_up: bool = field(default=False)
+    """Whether :meth:`prime` also calls :meth:`warm_up`."""
+
+    stats: PredictionStats = field(default_factory=PredictionStats)
+    """The latencies of each stage of the prediction pipeline and counts of
+    what was predicted.
+
     """
     def __post_init__(self):
         self._section_id_app = PersistedWork('_section_id_app', self)
         self._header_app = PersistedWork('_header_app', self)
+        # the parse process pool with the ID of its parser and its size
+        self._parse_pool: Optional[Tuple[Pool, int, int]] = None
+        self._parse_pool_lock = threading.Lock()
+        self._parse_pool_warned: bool = False
+        # the parser and document cache are used by one thread at a time
+        self._parse_lock = threading.Lock()
 
     def _get_section_id_fac(self) -> ModelFacade:
         return self.section_id_model_unpacker.facade
@@ -94,6 +198,13 @@ class SectionPredictor(PersistableContainer, Primeable):
             return p
 
         avoid: Set[str] = set(': \n\t\r')
+        # header spans can only be added to sections that begin where they do,
+        # so index them by where they begin to merge in linear time
+        begin_hspans: Dict[int, List[LexicalSpan]] = {}
+        hsec: Section
+        for hsec in hn.sections.values():
+            begin_hspans.setdefault(hsec.body_span.begin, []).append(
+                hsec.body_span)
         ssec: Section
         for ssec in sn.sections.values():
             sspan: LexicalSpan = ssec.body_span
@@ -101,14 +212,12 @@ class SectionPredictor(PersistableContainer, Primeable):
             if logger.isEnabledFor(logging.DEBUG):
                 logger.debug(f'sec span: {ssec}: {ssec.body_doc}, ' +
                              f'lex: {ssec.lexspan}/{sspan}')
-            hsec: Section
-            for hsec in hn.sections.values():
-                hspan: LexicalSpan = hsec.body_span
+            hspan: LexicalSpan
+            for hspan in begin_hspans.get(sspan.begin, ()):
                 if logger.isEnabledFor(logging.DEBUG):
-                    logger.debug(f'header span: {hsec}: {hsec.body_doc}, ' +
-                                 f'overlap: {hspan.overlaps_with(sspan)}, ' +
-                                 f'begin: {hspan.begin == sspan.begin}')
-                if hspan.overlaps_with(sspan) and hspan.begin == sspan.begin:
+                    logger.debug(f'header span: {hspan}, ' +
+                                 f'overlap: {hspan.overlaps_with(sspan)}')
+                if hspan.overlaps_with(sspan):
                     # skip over the colon and space after
                     if len(hspan) > 1 and \
                        sn.text[hspan.end - 1:hspan.end] == ':':
@@ -149,13 +258,31 @@ class SectionPredictor(PersistableContainer, Primeable):
                 filter(filter_sec, note.predicted_sections))
 
     def _predict_from_docs(self, docs: Tuple[FeatureDocument],
-                           sid_fac: SectionFacade) -> List[PredictedNote]:
-        snotes: List[PredictedNote] = sid_fac.predict(docs)
+                           sid_fac: SectionFacade,
+                           stats: PredictionStats = None) -> \
+            List[PredictedNote]:
+        stats = self.stats if stats is None else stats
         head_fac: SectionFacade = self._get_header_fac()
-        if head_fac is not None:
-            hnotes: List[PredictedNote] = head_fac.predict(docs)
-            self._merge_notes(snotes, hnotes)
-        self._trim_notes(snotes)
+        engine = FusedPredictionEngine(
+            section_facade=sid_fac,
+            header_facade=head_fac,
+            fuse=self.fuse_models,
+            concurrent=self.concurrent_models,
+            stats=stats)
+        snotes: List[PredictedNote]
+        if head_fac is None:
+            snotes = engine.predict_sections(docs)
+        else:
+            hnotes: List[PredictedNote]
+            snotes, hnotes = engine.predict(docs)
+            with stats.time('merge'):
+                self._merge_notes(snotes, hnotes)
+        with stats.time('trim'):
+            self._trim_notes(snotes)
+        stats.count(
+            notes=len(snotes),
+            tokens=sum(map(lambda d: d.token_len, docs)),
+            sections=sum(map(lambda n: len(n.predicted_sections), snotes)))
         return snotes
 
     def predict_from_docs(self, docs: Tuple[FeatureDocument]) -> \
@@ -163,31 +290,224 @@ class SectionPredictor(PersistableContainer, Primeable):
         sid_fac: SectionFacade = self._get_section_id_fac()
         return self._predict_from_docs(docs, sid_fac)
 
-    def _predict(self, doc_texts: List[str]) -> List[PredictedNote]:
-        sid_fac: SectionFacade = self._get_section_id_fac()
-        doc_parser: FeatureDocumentParser = \
-            sid_fac.doc_parser if self.doc_parser is None else self.doc_parser
-        docs: Tuple[FeatureDocument] = tuple(map(doc_parser, doc_texts))
-        return self._predict_from_docs(docs, sid_fac)
+    @property
+    def doc_cache_stats(self) -> Optional[Dict[str, int]]:
+        """The parsed document cache hit and miss counts, or ``None`` if
+        :obj:`doc_cache` is not set.
 
-    def predict(self, doc_texts: List[str]) -> Tuple[SectionContainer]:
-        """Collate the predictions of both the section ID (type) and header
-        token models.
+        """
+        if self.doc_cache is not None:
+            return self.doc_cache.stats
 
-        :param doc_texts: the text of the medical note to segment
+    def _get_parse_workers(self) -> int:
+        """Return the number of parse processes (see :obj:`parse_workers`)."""
+        workers: int = self.parse_workers
+        if workers <= 0:
+            workers = os.cpu_count() + workers
+        return workers
 
-        :return: a list of the predictions as notes for each respective
-                 ``doc_texts``
+    def _close_parse_pool(self):
+        if self._parse_pool is not None:
+            self._parse_pool[0].terminate()
+            self._parse_pool = None
+
+    def _get_parse_pool(self, doc_parser: FeatureDocumentParser,
+                        workers: int) -> Optional[Pool]:
+        """Return the process pool used to parse documents, which is created if
+        it does not yet exist, or ``None`` if it can not be created in this
+        thread (see :obj:`parse_workers`).
+
+        """
+        with self._parse_pool_lock:
+            if self._parse_pool is not None:
+                pool, parser_id, pool_workers = self._parse_pool
+                if parser_id == id(doc_parser) and pool_workers == workers:
+                    return pool
+                self._close_parse_pool()
+            if threading.current_thread() is not threading.main_thread():
+                if not self._parse_pool_warned:
+                    logger.warning('not creating the parse pool outside the ' +
+                                   'main thread--parsing in this process')
+                    self._parse_pool_warned = True
+                return None
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f'creating parse pool of {workers} workers')
+            pool = mp.get_context('fork').Pool(
+                workers,
+                initializer=_init_parse_worker,
+                initargs=(doc_parser,))
+            self._parse_pool = (pool, id(doc_parser), workers)
+            return pool
+
+    def _parse_texts(self, doc_parser: FeatureDocumentParser,
+                     texts: List[str]) -> Iterable[FeatureDocument]:
+        """Parse ``texts`` across :obj:`parse_workers` child processes."""
+        workers: int = self._get_parse_workers()
+        pool: Optional[Pool] = None
+        if workers > 1 and len(texts) > 1:
+            pool = self._get_parse_pool(doc_parser, workers)
+        if pool is None:
+            return map(doc_parser, texts)
+        chunk_size: int = math.ceil(len(texts) / workers)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'parsing {len(texts)} documents across ' +
+                        f'{workers} workers')
+        return pool.map(_parse_in_worker, texts, chunksize=chunk_size)
+
+    def _parse_docs(self, doc_parser: FeatureDocumentParser,
+                    doc_texts: List[str]) -> Tuple[FeatureDocument]:
+        """Parse ``doc_texts`` using cached documents when available."""
+        cache: ParsedDocumentStash = self.doc_cache
+        keys: List[str] = None
+        docs: List[Optional[FeatureDocument]] = [None] * len(doc_texts)
+        if cache is not None:
+            keys = list(map(cache.create_key, doc_texts))
+            docs = list(map(cache.load, keys))
+        missing: List[int] = [i for i, d in enumerate(docs) if d is None]
+        parsed: Iterable[FeatureDocument] = self._parse_texts(
+            doc_parser, list(map(lambda i: doc_texts[i], missing)))
+        i: int
+        doc: FeatureDocument
+        for i, doc in zip(missing, parsed):
+            docs[i] = doc
+            if cache is not None:
+                cache.dump(keys[i], doc)
+        return tuple(docs)
+
+    def _get_doc_parser(self, sid_fac: SectionFacade) -> FeatureDocumentParser:
+        return sid_fac.doc_parser if self.doc_parser is None \
+            else self.doc_parser
+
+    def _parse(self, doc_texts: List[str],
+               sid_fac: SectionFacade) -> Tuple[FeatureDocument]:
+        doc_parser: FeatureDocumentParser = self._get_doc_parser(sid_fac)
+        with self._parse_lock:
+            with self.stats.time('parse'):
+                return self._parse_docs(doc_parser, doc_texts)
+
+    def parse(self, doc_texts: Sequence[str]) -> Tuple[FeatureDocument]:
+        """Parse notes as :meth:`predict` does, which uses :obj:`doc_cache` and
+        :obj:`parse_workers`.  Threads that call this method (or predict text)
+        parse one at a time since the parser is not thread safe.
+
+        :param doc_texts: the text of the notes to parse
+
+        :return: the parsed notes in the order of ``doc_texts``
 
         """
-        secs: Iterable[SectionContainer]
-        if self.auto_deallocate:
+        return self._parse(list(doc_texts), self._get_section_id_fac())
+
+    def create_parse_pool(self):
+        """Create the process pool used to parse documents if
+        :obj:`parse_workers` is greater than one and it does not yet exist.
+        This is called in the main thread before predicting in other threads so
+        they parse across processes (see :obj:`parse_workers`).
+
+        """
+        workers: int = self._get_parse_workers()
+        if workers > 1:
+            doc_parser: FeatureDocumentParser = \
+                self._get_doc_parser(self._get_section_id_fac())
+            self._get_parse_pool(doc_parser, workers)
+
+    def _predict_batch(self, docs: Sequence[Union[str, FeatureDocument]],
+                       filter_notes: Optional[bool]) -> \
+            List[SectionContainer]:
+        sid_fac: SectionFacade = self._get_section_id_fac()
+        docs = list(docs)
+        text_ixs: List[int] = [i for i, d in enumerate(docs)
+                               if not isinstance(d, FeatureDocument)]
+        i: int
+        doc: FeatureDocument
+        if len(text_ixs) > 0:
+            for i, doc in zip(text_ixs, self._parse(
+                    list(map(lambda i: docs[i], text_ixs)), sid_fac)):
+                docs[i] = doc
+        notes: List[SectionContainer] = self._predict_from_docs(docs, sid_fac)
+        filter_ixs: Sequence[int] = text_ixs if filter_notes is None \
+            else range(len(notes)) if filter_notes else ()
+        if len(filter_ixs) > 0:
+            with self.stats.time('filter'):
+                note: SectionContainer
+                for i, note in zip(filter_ixs, self._filter_notes(
+                        map(lambda i: notes[i], filter_ixs))):
+                    notes[i] = note
+        return notes
+
+    def _predict_batch_fallback(
+            self, docs: Sequence[Union[str, FeatureDocument]],
+            filter_notes: Optional[bool]) -> \
+            List[Union[SectionContainer, Exception]]:
+        """Predict ``docs`` in one batch, and if that fails, each separately so
+        only the notes that fail are given as their errors.
+
+        """
+        try:
+            return self._predict_batch(docs, filter_notes)
+        except Exception as e:
+            if len(docs) == 1:
+                return [e]
+            logger.error(f'could not predict batch: {e}--predicting each note',
+                         exc_info=True)
+        preds: List[Union[SectionContainer, Exception]] = []
+        doc: Union[str, FeatureDocument]
+        for doc in docs:
             try:
-                secs = self._predict(doc_texts)
-            finally:
+                preds.extend(self._predict_batch([doc], filter_notes))
+            except Exception as e:
+                preds.append(e)
+        return preds
+
+    def predict_batch(self, docs: Sequence[Union[str, FeatureDocument]],
+                      filter_notes: bool = None, fallback: bool = False) -> \
+            List[Union[SectionContainer, Exception]]:
+        """Predict notes given as text, parsed documents or both in one batch.
+        Notes given as text are parsed and filtered as with :meth:`predict`
+        and documents are predicted as with :meth:`predict_from_docs`.
+
+        :param docs: the text or parsed documents of the notes to predict
+
+        :param filter_notes: whether to keep sections of all notes per
+                             :obj:`section_filter_type`, or ``None`` to filter
+                             only the notes given as text
+
+        :param fallback: if ``True`` and the batch can not be predicted, predict
+                         each note separately and return the error of each note
+                         that fails in its place rather than raising it
+
+        :return: the predicted notes (or errors) in the order of ``docs``
+
+        """
+        docs = list(docs)
+        pred_fn: Callable = self._predict_batch_fallback if fallback \
+            else self._predict_batch
+        with self.stats.time('predict'):
+            if self.auto_deallocate:
+                try:
+                    return pred_fn(docs, filter_notes)
+                finally:
+                    self.deallocate()
+            else:
+                return pred_fn(docs, filter_notes)
+
+    @contextmanager
+    def allocated(self) -> Iterator[SectionPredictor]:
+        """Keep the models and parser between predictions made in the ``with``
+        block, then deallocate them if :obj:`auto_deallocate` is ``True``.
+
+        """
+        auto_deallocate: bool = self.auto_deallocate
+        self.auto_deallocate = False
+        try:
+            yield self
+        finally:
+            self.auto_deallocate = auto_deallocate
+            if auto_deallocate:
                 self.deallocate()
-        else:
-            secs = self._predict(doc_texts)
+
+    def _filter_notes(self, secs: Iterable[PredictedNote]) -> \
+            Tuple[SectionContainer]:
+        """Keep sections per :obj:`section_filter_type`."""
         filter_fn: Callable = {
             SectionFilterType.keep_all:
             lambda: map(lambda s: GapSectionContainer(s, False), secs),
@@ -200,17 +520,82 @@ class SectionPredictor(PersistableContainer, Primeable):
         }[self.section_filter_type]
         return tuple(filter_fn())
 
+    def predict(self, doc_texts: List[str]) -> Tuple[SectionContainer]:
+        """Collate the predictions of both the section ID (type) and header
+        token models.
+
+        :param doc_texts: the text of the medical note to segment
+
+        :return: a list of the predictions as notes for each respective
+                 ``doc_texts``
+
+        """
+        return tuple(self.predict_batch(doc_texts))
+
     def prime(self):
         if logger.isEnabledFor(logging.INFO):
             logger.info(f'priming {type(self)}...')
-        self.section_id_model_packer.install_model()
-        self.header_model_packer.install_model()
+        self.section_id_model_unpacker.install_model()
+        if self.header_model_unpacker is not None:
+            self.header_model_unpacker.install_model()
+        if self.prime_warm_up:
+            self.warm_up()
         super().prime()
 
+    def warm_up(self, text: str = None) -> Dict[str, float]:
+        """Install and load the models, create the document parser and predict
+        a note so the lazily allocated resources are created before the first
+        prediction.  This is only useful when :obj:`auto_deallocate` is
+        ``False`` since otherwise the models are deallocated after the next
+        prediction.
+
+        :param text: the note to predict, which defaults to
+                     :obj:`WARM_UP_NOTE`
+
+        :return: the number of seconds taken by each stage
+
+        """
+        text = self.WARM_UP_NOTE if text is None else text
+        timings: Dict[str, float] = {}
+        start: float = monotonic()
+
+        def stage(name: str, fn: Callable) -> Any:
+            t: float = monotonic()
+            ret: Any = fn()
+            timings[name] = monotonic() - t
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f'warm up {name}: {timings[name]:.3f}s')
+            return ret
+
+        def install():
+            self.section_id_model_unpacker.install_model()
+            if self.header_model_unpacker is not None:
+                self.header_model_unpacker.install_model()
+
+        stage('install', install)
+        sid_fac: SectionFacade = stage(
+            'section_facade', self._get_section_id_fac)
+        stage('header_facade', self._get_header_fac)
+        doc_parser: FeatureDocumentParser = stage(
+            'doc_parser', lambda: self._get_doc_parser(sid_fac))
+        if self._get_parse_workers() > 1:
+            stage('parse_pool', self.create_parse_pool)
+        # parse directly to keep the synthetic note out of the document cache
+        doc: FeatureDocument = stage('parse', lambda: doc_parser(text))
+        # keep the statistics of the synthetic note out of the real predictions
+        stage('predict', lambda: self._predict_from_docs(
+            [doc], sid_fac, PredictionStats()))
+        timings['total'] = monotonic() - start
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'warmed up in {timings["total"]:.3f}s')
+        return timings
+
     def deallocate(self):
         super().deallocate()
         self._section_id_app.clear()
         self._header_app.clear()
+        with self._parse_pool_lock:
+            self._close_parse_pool()
 
     def __call__(self, docs: List[Union[str, FeatureDocument]]) -> \
             List[PredictedNote]:
@@ -221,15 +606,340 @@ class SectionPredictor(PersistableContainer, Primeable):
             return self.predict(docs)
 
 
+@dataclass
+class BatchingSectionPredictor(PersistableContainer):
+    """Collects notes submitted concurrently by callers (i.e. threads) and
+    predicts them together using :meth:`.SectionPredictor.predict_from_docs`.
+    A batch is predicted after :obj:`max_batch_size` notes are queued or
+    :obj:`max_latency` seconds after the first note of the batch was queued,
+    whichever comes first.  Each caller is given a future of its own note.
+
+    Notes submitted as text are parsed and filtered as with
+    :meth:`.SectionPredictor.predict`, and those submitted as documents are
+    predicted as with :meth:`.SectionPredictor.predict_from_docs` (see
+    :meth:`.SectionPredictor.predict_batch`).
+
+    """
+    section_predictor: SectionPredictor = field()
+    """The predictor used for all batches, which is owned by this instance (see
+    :class:`.SectionPredictor`).
+
+    """
+    max_batch_size: int = field(default=20)
+    """The maximum number of notes to predict in one batch."""
+
+    max_latency: float = field(default=0.025)
+    """The maximum number of seconds to wait for more notes after the first
+    note of a batch is queued.
+
+    """
+    def __post_init__(self):
+        super().__init__()
+        self._auto_deallocate: bool = self.section_predictor.auto_deallocate
+        self.section_predictor.auto_deallocate = False
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: threading.Thread = None
+
+    @property
+    def queued(self) -> int:
+        """The number of notes waiting to be predicted."""
+        return self._queue.qsize()
+
+    def _start(self):
+        with self._lock:
+            if self._worker is None:
+                # fork parse processes before starting the worker thread
+                self.section_predictor.create_parse_pool()
+                self._worker = threading.Thread(
+                    target=self._predict_batches, daemon=True)
+                self._worker.start()
+
+    def submit(self, doc: Union[str, FeatureDocument]) -> Future:
+        """Queue a note for prediction.
+
+        :param doc: the note text or its parsed document
+
+        :return: a future of the predicted note
+
+        """
+        self._start()
+        fut = Future()
+        self._queue.put((doc, fut))
+        return fut
+
+    def predict(self, docs: Iterable[Union[str, FeatureDocument]]) -> \
+            Tuple[SectionContainer]:
+        """Queue notes for prediction and wait for their results."""
+        futs: Tuple[Future] = tuple(map(self.submit, docs))
+        return tuple(map(lambda f: f.result(), futs))
+
+    def _take_batch(self) -> List[Tuple[Union[str, FeatureDocument], Future]]:
+        """Wait for a note and those that arrive before the deadline.  Notes
+        whose futures were cancelled by their callers are dropped, and the
+        rest can no longer be cancelled.
+
+        """
+        item: Tuple[Union[str, FeatureDocument], Future] = self._queue.get()
+        if item is None:
+            return None
+        items: List[Tuple[Union[str, FeatureDocument], Future]] = [item]
+        deadline: float = monotonic() + self.max_latency
+        while len(items) < self.max_batch_size:
+            remaining: float = deadline - monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # predict what we have, then stop on the next take
+                self._queue.put(None)
+                break
+            items.append(item)
+        return list(filter(lambda i: i[1].set_running_or_notify_cancel(),
+                           items))
+
+    @staticmethod
+    def _set_result(fut: Future, result: Union[SectionContainer, Exception]):
+        """Resolve ``fut`` unless it is already done."""
+        try:
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+        except InvalidStateError as e:
+            logger.warning(f'could not set prediction result: {e}')
+
+    def _predict_batch(self, items: List[Tuple[Union[str, FeatureDocument],
+                                               Future]]):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f'predicting batch of {len(items)}')
+        # predict separately on failure so one bad note does not fail the batch
+        notes: List[Union[SectionContainer, Exception]] = \
+            self.section_predictor.predict_batch(
+                list(map(lambda i: i[0], items)), fallback=True)
+        note: Union[SectionContainer, Exception]
+        fut: Future
+        for (_, fut), note in zip(items, notes):
+            self._set_result(fut, note)
+
+    def _predict_batches(self):
+        while True:
+            items: List[Tuple[Union[str, FeatureDocument], Future]] = \
+                self._take_batch()
+            if items is None:
+                break
+            try:
+                if len(items) > 0:
+                    self._predict_batch(items)
+            except Exception as e:
+                # keep the worker alive for the notes submitted later
+                logger.error(f'could not predict batch: {e}', exc_info=True)
+                item: Tuple[Union[str, FeatureDocument], Future]
+                for item in items:
+                    if not item[1].done():
+                        self._set_result(item[1], e)
+
+    def deallocate(self):
+        with self._lock:
+            if self._worker is not None:
+                self._queue.put(None)
+                self._worker.join()
+                self._worker = None
+        self.section_predictor.auto_deallocate = self._auto_deallocate
+        self.section_predictor.deallocate()
+        super().deallocate()
+
+
+@dataclass
+class AsyncSectionPredictor(PersistableContainer):
+    """An :mod:`asyncio` interface to a :class:`.SectionPredictor` that keeps
+    the event loop responsive by parsing and predicting in executors.  Notes are
+    parsed :obj:`batch_size` at a time while the previous batch is predicted.
+    Parsed batches wait in a queue of at most :obj:`max_queued` batches, which
+    stops parsing when prediction (or the caller) falls behind.
+
+    Each batch is parsed across the section predictor's
+    :obj:`~.SectionPredictor.parse_workers` processes when the event loop runs
+    in the main thread, which creates the process pool.
+
+    Predicted notes are returned as each batch completes with
+    :meth:`iter_predict` and :meth:`iter_predict_from_docs`.
+
+    """
+    section_predictor: SectionPredictor = field()
+    """The predictor used for all batches, which is owned by this instance (see
+    :class:`.SectionPredictor`).
+
+    """
+    batch_size: int = field(default=20)
+    """The maximum number of notes to parse and predict at once."""
+
+    max_queued: int = field(default=2)
+    """The maximum number of parsed batches waiting for prediction."""
+
+    parse_executor: Executor = field(default=None)
+    """Parses notes, which defaults to a single thread since the parser is used
+    by one thread at a time.
+
+    """
+    predict_executor: Executor = field(default=None)
+    """Predicts notes, which defaults to a single thread since the models are
+    used by one thread at a time.
+
+    """
+    def __post_init__(self):
+        super().__init__()
+        self._auto_deallocate: bool = self.section_predictor.auto_deallocate
+        self.section_predictor.auto_deallocate = False
+        self._owned_executors: List[Executor] = []
+        if self.parse_executor is None:
+            self.parse_executor = self._create_executor(1)
+        if self.predict_executor is None:
+            self.predict_executor = self._create_executor(1)
+
+    def _create_executor(self, workers: int) -> Executor:
+        executor = ThreadPoolExecutor(max_workers=workers)
+        self._owned_executors.append(executor)
+        return executor
+
+    async def _parse_batches(self, batches: List[Tuple[Tuple[int, ...],
+                                                       List[str]]],
+                             parsed: asyncio.Queue):
+        """Parse ``batches`` and add them to the ``parsed`` queue."""
+        loop = asyncio.get_running_loop()
+        sp: SectionPredictor = self.section_predictor
+        try:
+            ixs: Tuple[int, ...]
+            texts: List[str]
+            for ixs, texts in batches:
+                docs: Tuple[FeatureDocument] = await loop.run_in_executor(
+                    self.parse_executor, sp.parse, texts)
+                await parsed.put((ixs, docs))
+        except Exception as e:
+            await parsed.put(e)
+        await parsed.put(None)
+
+    async def _iterate(self, docs: Sequence[Union[str, FeatureDocument]],
+                       parse: bool) -> \
+            AsyncIterator[Tuple[int, SectionContainer]]:
+        loop = asyncio.get_running_loop()
+        sp: SectionPredictor = self.section_predictor
+        if parse and threading.current_thread() is threading.main_thread():
+            # fork the parse processes before the executors parse
+            sp.create_parse_pool()
+        batches: List[Tuple[Tuple[int, ...], List[Union[str,
+                                                        FeatureDocument]]]] = \
+            list(map(lambda c: (tuple(map(lambda x: x[0], c)),
+                                list(map(lambda x: x[1], c))),
+                     chunks(enumerate(docs), self.batch_size)))
+        parsed = asyncio.Queue(maxsize=self.max_queued)
+        producer: asyncio.Task = None
+        source: Iterable[Tuple[Tuple[int, ...], List[FeatureDocument]]] = \
+            iter(batches)
+        if parse:
+            producer = asyncio.create_task(
+                self._parse_batches(batches, parsed))
+        try:
+            while True:
+                item: Tuple[Tuple[int, ...], List[FeatureDocument]] = \
+                    next(source, None) if producer is None \
+                    else await parsed.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                ixs, batch_docs = item
+                notes: List[SectionContainer] = await loop.run_in_executor(
+                    self.predict_executor, sp.predict_batch,
+                    list(batch_docs), parse)
+                ix: int
+                note: SectionContainer
+                for ix, note in zip(ixs, notes):
+                    yield ix, note
+        finally:
+            if producer is not None and not producer.done():
+                producer.cancel()
+
+    def iter_predict(self, texts: Sequence[str]) -> \
+            AsyncIterator[Tuple[int, SectionContainer]]:
+        """Parse and predict notes as with :meth:`.SectionPredictor.predict`.
+
+        :param texts: the text of the notes to predict
+
+        :return: an iterator of the index in ``texts`` and the predicted note
+                 in the order the notes are predicted
+
+        """
+        return self._iterate(texts, True)
+
+    def iter_predict_from_docs(self, docs: Sequence[FeatureDocument]) -> \
+            AsyncIterator[Tuple[int, PredictedNote]]:
+        """Predict notes as with :meth:`.SectionPredictor.predict_from_docs`.
+
+        :param docs: the parsed notes to predict
+
+        :return: an iterator of the index in ``docs`` and the predicted note
+                 in the order the notes are predicted
+
+        """
+        return self._iterate(docs, False)
+
+    async def _collect(self, it: AsyncIterator[Tuple[int, SectionContainer]],
+                       n: int) -> List[SectionContainer]:
+        notes: List[SectionContainer] = [None] * n
+        ix: int
+        note: SectionContainer
+        async for ix, note in it:
+            notes[ix] = note
+        return notes
+
+    async def predict(self, texts: Sequence[str]) -> List[SectionContainer]:
+        """Like :meth:`iter_predict`, but return the notes in the order of
+        ``texts`` after all are predicted.
+
+        """
+        return await self._collect(self.iter_predict(texts), len(texts))
+
+    async def predict_from_docs(self, docs: Sequence[FeatureDocument]) -> \
+            List[PredictedNote]:
+        """Like :meth:`iter_predict_from_docs`, but return the notes in the
+        order of ``docs`` after all are predicted.
+
+        """
+        return await self._collect(self.iter_predict_from_docs(docs), len(docs))
+
+    def deallocate(self):
+        executor: Executor
+        for executor in self._owned_executors:
+            executor.shutdown(wait=True)
+        self._owned_executors.clear()
+        self.section_predictor.auto_deallocate = self._auto_deallocate
+        self.section_predictor.deallocate()
+        super().deallocate()
+
+
 @dataclass
 class PredictionNoteFactory(AnnotationNoteFactory):
     """A note factory that predicts so that
     :class:`~zensols.mimic.adm.HospitalAdmissionDbStash` predicts missing
     sections.
 
-    **Implementation note:** The :obj:`section_predictor_name` is used with the
-    application context factory :obj:`config_factory` since declaring it in the
-    configuration creates an instance cycle.
+    The unannotated notes of an admission are predicted together in one batch
+    when the first of them is created.  The predictions are kept until a note
+    of another admission is created so the notes of the admission are created
+    from the batch however many times they are read.
+
+    Predicted sections are stored in :obj:`prediction_stash` so they outlive
+    the cached admissions and are only predicted again when the note text or
+    model version changes.
+
+    **Implementation note:** The :obj:`section_predictor_name` and
+    :obj:`note_event_persister_name` are used with the application context
+    factory :obj:`config_factory` since declaring them in the configuration
+    creates an instance cycle.
 
     """
     config_factory: ConfigFactory = field()
@@ -245,8 +955,24 @@ class PredictionNoteFactory(AnnotationNoteFactory):
     class docs.
 
     """
-    def __post_init__(self, section_predictor_name: str):
+    note_event_persister_name: InitVar[str] = field(default=None)
+    """The name of the note event persister as an app config section name used
+    to predict the unannotated notes of an admission in one batch.  If
+    ``None``, notes are predicted one at a time.  See class docs.
+
+    """
+    prediction_stash: Optional[PredictedSectionStash] = field(default=None)
+    """Stores the predicted sections of notes so they are reused, rather than
+    predicted again, when the cached admissions are recreated.
+
+    """
+    def __post_init__(self, section_predictor_name: str,
+                      note_event_persister_name: str):
         self._section_predictor_name = section_predictor_name
+        self._note_event_persister_name = note_event_persister_name
+        # the admission ID and predictions (or errors) of its notes by row ID
+        self._adm_preds: Tuple[int, Dict[int, Union[PredictedNote,
+                                                    Exception]]] = (None, {})
 
     @property
     @persisted('_section_predictor')
@@ -257,20 +983,92 @@ class PredictionNoteFactory(AnnotationNoteFactory):
         sp.auto_deallocate = False
         return sp
 
+    @property
+    @persisted('_note_event_persister')
+    def note_event_persister(self) -> Optional[NoteEventPersister]:
+        """The persister used to find the notes of an admission, or ``None`` to
+        predict notes one at a time (see class docs).
+
+        """
+        if self._note_event_persister_name is not None:
+            return self.config_factory(self._note_event_persister_name)
+
     def prime(self):
         if logger.isEnabledFor(logging.INFO):
             logger.info(f'priming {type(self)}...')
         self.section_predictor.prime()
         super().prime()
 
+    def _predict_admission(self, note_event: NoteEvent) -> \
+            Dict[int, Union[PredictedNote, Exception]]:
+        """Predict all unannotated notes of ``note_event``'s admission in one
+        batch.  If the batch can not be predicted, each note is predicted
+        separately so only the notes that fail are mapped to their errors.
+
+        """
+        sp: SectionPredictor = self.section_predictor
+        nep: NoteEventPersister = self.note_event_persister
+        store: PredictedSectionStash = self.prediction_stash
+        events: List[NoteEvent] = [note_event]
+        row_id: int
+        for row_id in nep.get_row_ids_by_hadm_id(note_event.hadm_id):
+            if row_id != note_event.row_id:
+                ne: NoteEvent = nep.get_by_id(row_id)
+                if ne is None or \
+                   self.anon_resource.get_annotation(ne) is not None:
+                    continue
+                if store is not None and \
+                   store.exists(store.create_key(ne.row_id, ne.text)):
+                    continue
+                events.append(ne)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(f'predicting {len(events)} notes of admission ' +
+                        f'{note_event.hadm_id}')
+        preds: List[Union[PredictedNote, Exception]] = sp.predict_batch(
+            tuple(map(lambda ne: ne.doc, events)), fallback=True)
+        if store is not None:
+            ne: NoteEvent
+            pred: Union[PredictedNote, Exception]
+            for ne, pred in zip(events, preds):
+                if not isinstance(pred, Exception):
+                    store.dump_note(ne.row_id, pred)
+        return dict(zip(map(lambda ne: ne.row_id, events), preds))
+
+    def _predict_note(self, note_event: NoteEvent) -> PredictedNote:
+        """Return the prediction of ``note_event``, which is taken from
+        :obj:`prediction_stash` or the predictions of its admission when
+        :obj:`note_event_persister` is set.
+
+        """
+        sp: SectionPredictor = self.section_predictor
+        store: PredictedSectionStash = self.prediction_stash
+        pred_note: PredictedNote = None
+        if store is not None:
+            pred_note = store.load_note(note_event.row_id, note_event.doc)
+        if pred_note is None and self.note_event_persister is not None:
+            hadm_id, preds = self._adm_preds
+            # notes of the admission not in the batch are predicted separately
+            if hadm_id != note_event.hadm_id:
+                preds = self._predict_admission(note_event)
+                self._adm_preds = (note_event.hadm_id, preds)
+            pred: Union[PredictedNote, Exception] = \
+                preds.get(note_event.row_id)
+            if isinstance(pred, Exception):
+                raise pred
+            pred_note = pred
+        if pred_note is None:
+            pred_note = sp.predict_from_docs([note_event.doc])[0]
+            if store is not None:
+                store.dump_note(note_event.row_id, pred_note)
+        return pred_note
+
     def _create_missing_anon_note(self, note_event: NoteEvent,
                                   section: str) -> Note:
-        sp: SectionPredictor = self.section_predictor
         note: Note = None
         try:
             if logger.isEnabledFor(logging.DEBUG):
                 logger.info(f'predicting note: {note_event}')
-            pred_note: PredictedNote = sp.predict_from_docs([note_event.doc])[0]
+            pred_note: PredictedNote = self._predict_note(note_event)
             if len(pred_note.sections) == 0:
                 note = None
             else:
@@ -0,0 +1,148 @@
+"""A local HTTP server that predicts sections with models kept in memory.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import List, Tuple, Dict, Any
+from dataclasses import dataclass, field
+import logging
+import json
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from zensols.mimic import SectionContainer
+from .pred import SectionPredictor, BatchingSectionPredictor
+
+logger = logging.getLogger(__name__)
+
+
+class _PredictionRequestHandler(BaseHTTPRequestHandler):
+    """Handles health checks (``GET /health``) and predictions (``POST
+    /predict``) with a JSON body having either a ``text`` string or a
+    ``texts`` list of strings.
+
+    """
+    def _write_json(self, status: HTTPStatus, content: str):
+        data: bytes = content.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_error(self, status: HTTPStatus, msg: str):
+        self._write_json(status, json.dumps({'error': msg}))
+
+    def do_GET(self):
+        server: PredictionServer = self.server.prediction_server
+        if self.path == '/health':
+            self._write_json(HTTPStatus.OK, json.dumps(server.health))
+        else:
+            self._write_error(HTTPStatus.NOT_FOUND, f'No path: {self.path}')
+
+    def do_POST(self):
+        server: PredictionServer = self.server.prediction_server
+        if self.path != '/predict':
+            self._write_error(HTTPStatus.NOT_FOUND, f'No path: {self.path}')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            req: Dict[str, Any] = json.loads(self.rfile.read(length))
+            texts: List[str] = req['texts'] if 'texts' in req \
+                else [req['text']]
+            if not all(map(lambda t: isinstance(t, str), texts)):
+                raise ValueError('Expecting note text strings')
+        except Exception as e:
+            self._write_error(HTTPStatus.BAD_REQUEST, f'Bad request: {e}')
+            return
+        try:
+            notes: Tuple[SectionContainer] = server.predict(texts)
+        except Exception as e:
+            logger.error(f'could not predict: {e}', exc_info=True)
+            self._write_error(HTTPStatus.INTERNAL_SERVER_ERROR,
+                              f'Could not predict: {e}')
+            return
+        self._write_json(
+            HTTPStatus.OK,
+            '{"notes": [' + ', '.join(map(lambda n: n.asjson(), notes)) + ']}')
+
+    def log_message(self, format: str, *args):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(format % args)
+
+
+@dataclass
+class PredictionServer(object):
+    """A local HTTP server that keeps the models resident across requests.
+    Notes from concurrent requests are predicted together using a
+    :class:`~zensols.mimicsid.pred.BatchingSectionPredictor`.
+
+    """
+    section_predictor: SectionPredictor = field()
+    """The predictor used for all requests, which is owned by this instance
+    (see :class:`~zensols.mimicsid.pred.SectionPredictor`).
+
+    """
+    host: str = field(default='localhost')
+    """The interface on which to listen."""
+
+    port: int = field(default=8080)
+    """The port on which to listen."""
+
+    max_batch_size: int = field(default=20)
+    """The maximum number of notes to predict in one batch."""
+
+    max_latency: float = field(default=0.025)
+    """The maximum number of seconds to wait for other requests' notes to add
+    to a batch.
+
+    """
+    warm_up: bool = field(default=True)
+    """Whether to load the models and predict a note before listening so the
+    first requests are predicted at steady state latency.
+
+    """
+    def __post_init__(self):
+        self._batcher = BatchingSectionPredictor(
+            section_predictor=self.section_predictor,
+            max_batch_size=self.max_batch_size,
+            max_latency=self.max_latency)
+        # the counts are updated by the request handler threads
+        self._count_lock = threading.Lock()
+        self._requests: int = 0
+        self._notes: int = 0
+
+    @property
+    def health(self) -> Dict[str, Any]:
+        """The status of the server."""
+        with self._count_lock:
+            requests: int = self._requests
+            notes: int = self._notes
+        return {'status': 'ok',
+                'requests': requests,
+                'notes': notes,
+                'queued': self._batcher.queued}
+
+    def predict(self, texts: List[str]) -> Tuple[SectionContainer]:
+        """Queue ``texts`` for prediction and wait for the results."""
+        notes: Tuple[SectionContainer] = self._batcher.predict(texts)
+        with self._count_lock:
+            self._requests += 1
+            self._notes += len(notes)
+        return notes
+
+    def run(self):
+        """Start the server and block until interrupted."""
+        if self.warm_up:
+            self.section_predictor.warm_up()
+        httpd = ThreadingHTTPServer(
+            (self.host, self.port), _PredictionRequestHandler)
+        httpd.prediction_server = self
+        logger.info(f'listening on http://{self.host}:{self.port}')
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            logger.info('shutting down')
+        finally:
+            httpd.server_close()
+            self._batcher.deallocate()
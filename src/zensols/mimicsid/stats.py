@@ -0,0 +1,97 @@
+"""Latency and throughput statistics of the prediction pipeline.
+
+"""
+__author__ = 'Paul Landes'
+
+from typing import Dict, Any, Iterator
+from dataclasses import dataclass, field
+import sys
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+from io import TextIOBase
+from zensols.config import Dictable
+
+
+@dataclass
+class PredictionStats(Dictable):
+    """Cumulative per-stage latencies and counts of notes, tokens and sections
+    predicted by :class:`~zensols.mimicsid.pred.SectionPredictor`.  Stages are
+    named by the pipeline, such as ``parse``, ``section_forward`` (the section
+    model forward pass) and ``merge``.  Stages that run in concurrent threads
+    (see :obj:`.SectionPredictor.concurrent_models`) overlap in time.
+
+    """
+    seconds: Dict[str, float] = field(default_factory=dict)
+    """The total number of seconds spent in each stage."""
+
+    calls: Dict[str, int] = field(default_factory=dict)
+    """The number of times each stage was run."""
+
+    notes: int = field(default=0)
+    """The number of notes predicted."""
+
+    tokens: int = field(default=0)
+    """The number of tokens of the notes predicted."""
+
+    sections: int = field(default=0)
+    """The number of sections predicted (before filtering)."""
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float):
+        """Add the number of seconds spent in a stage."""
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0) + seconds
+            self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    @contextmanager
+    def time(self, stage: str) -> Iterator[None]:
+        """Time the body of a ``with`` statement as ``stage``."""
+        start: float = perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, perf_counter() - start)
+
+    def count(self, notes: int = 0, tokens: int = 0, sections: int = 0):
+        """Add to the prediction counts."""
+        with self._lock:
+            self.notes += notes
+            self.tokens += tokens
+            self.sections += sections
+
+    def clear(self):
+        """Reset all statistics."""
+        with self._lock:
+            self.seconds.clear()
+            self.calls.clear()
+            self.notes = self.tokens = self.sections = 0
+
+    def _from_dictable(self, *args, **kwargs) -> Dict[str, Any]:
+        with self._lock:
+            return {'seconds': dict(self.seconds),
+                    'calls': dict(self.calls),
+                    'notes': self.notes,
+                    'tokens': self.tokens,
+                    'sections': self.sections}
+
+    def write(self, depth: int = 0, writer: TextIOBase = sys.stdout):
+        self._write_line(f'notes: {self.notes}, tokens: {self.tokens}, ' +
+                         f'sections: {self.sections}', depth, writer)
+        self._write_line('stages:', depth, writer)
+        stage: str
+        secs: float
+        for stage, secs in self.seconds.items():
+            calls: int = self.calls[stage]
+            self._write_line(f'{stage}: {secs:.3f}s, calls: {calls}, ' +
+                             f'mean: {secs / calls * 1000:.1f}ms',
+                             depth + 1, writer)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return self._from_dictable()
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
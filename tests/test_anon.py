@@ -1,13 +1,19 @@
-from typing import Tuple
+from typing import Tuple, Dict, Any
 import unittest
 import logging
 import shutil
+import json
+import threading
+from zipfile import ZipFile
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
 from pathlib import Path
 from zensols.config import ImportIniConfig, ImportConfigFactory
 from zensols.persist import Stash
 from zensols.mimic import HospitalAdmission, Note
 from zensols.mimic.regexnote import EchoNote
 from zensols.mimicsid import AnnotatedNote
+from zensols.mimicsid.anon import AnnotationResource
 
 logger = logging.getLogger(__name__)
 
@@ -71,3 +77,84 @@ class TestAnnotationAccess(unittest.TestCase):
     def test_with_anon(self):
         if self._validate_db_exists():
             self._test_with_anon()
+
+
+class _ZipInstaller(object):
+    def __init__(self, path: Path):
+        self.path = path
+
+    def __call__(self):
+        pass
+
+    def get_singleton_path(self) -> Path:
+        return self.path
+
+
+class TestAnnotationIndex(unittest.TestCase):
+    NOTES = ((100, 10, 'Discharge summary'), (100, 11, 'Radiology'),
+             (101, 12, 'Physician'), (102, 13, 'Nursing/other'))
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        path = Path(self.temp_dir.name)
+        zip_path: Path = path / 'anons.zip'
+        root: str = AnnotationResource._ROOT_ZIP_DIR
+        with ZipFile(zip_path, 'w') as zf:
+            zf.writestr(f'{root}/ontology.csv', 'section_id,note_name\n')
+            for hadm_id, row_id, cat in self.NOTES:
+                cat_id: str = AnnotationResource.category_to_id(cat)
+                anon: Dict[str, Any] = {
+                    'hadm_id': hadm_id, 'row_id': row_id, 'category': cat,
+                    'sections': [{'id': 'findings',
+                                  'body_span': {'begin': 0, 'end': row_id}}]}
+                zf.writestr(
+                    f'{root}/annotations/{hadm_id}-{row_id}-{cat_id}.json',
+                    json.dumps(anon))
+        installer = _ZipInstaller(zip_path)
+        self.zip_res = AnnotationResource(installer)
+        self.index_res = AnnotationResource(
+            installer, index_path=path / 'index' / 'anons.sqlite3')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _note_event(self, hadm_id: int, row_id: int, cat: str):
+        return SimpleNamespace(hadm_id=hadm_id, row_id=row_id, category=cat)
+
+    def test_note_ids(self):
+        self.assertEqual(self.zip_res.note_ids.to_dict('records'),
+                         self.index_res.note_ids.to_dict('records'))
+        self.assertEqual(len(self.NOTES), len(self.index_res.note_ids))
+        self.assertTrue(self.index_res.index_path.is_file())
+
+    def test_get_annotation(self):
+        misses = ((100, 10, 'Radiology'), (101, 10, 'Discharge summary'),
+                  (999, 99, 'Nursing/other'))
+        for _ in range(2):
+            for args in self.NOTES + misses:
+                ne = self._note_event(*args)
+                should = self.zip_res.get_annotation(ne)
+                self.assertEqual(should, self.index_res.get_annotation(ne))
+                if args in self.NOTES:
+                    self.assertEqual(args[1], should['row_id'])
+                else:
+                    self.assertIsNone(should)
+        # parsed once and then shared
+        ne = self._note_event(*self.NOTES[0])
+        self.assertIs(self.index_res.get_annotation(ne),
+                      self.index_res.get_annotation(ne))
+
+    def test_thread_connections(self):
+        res: AnnotationResource = self.index_res
+        conns = []
+
+        def query():
+            conns.append(res._get_index_conn())
+            res.get_annotation(self._note_event(*self.NOTES[1]))
+
+        query()
+        self.assertIs(conns[0], res._get_index_conn())
+        thread = threading.Thread(target=query)
+        thread.start()
+        thread.join()
+        self.assertIsNot(conns[0], conns[1])
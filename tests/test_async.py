@@ -0,0 +1,77 @@
+from typing import List, Tuple
+import unittest
+import asyncio
+from zensols.mimicsid.pred import SectionPredictor, AsyncSectionPredictor
+
+
+class _StubPredictor(SectionPredictor):
+    """Parses text as its lower case and predicts the upper case of each note,
+    which fails on ``bad``.
+
+    """
+    def __post_init__(self):
+        super().__post_init__()
+        self.parsed: List[str] = []
+
+    def _get_section_id_fac(self):
+        return None
+
+    def _parse(self, doc_texts: List[str], sid_fac) -> Tuple[str]:
+        self.parsed.extend(doc_texts)
+        return tuple(map(str.lower, doc_texts))
+
+    def _predict_batch(self, docs: List[str], filter_notes: bool) -> List[str]:
+        if 'bad' in docs:
+            raise ValueError('bad note')
+        return list(map(str.upper, docs))
+
+
+class TestAsync(unittest.TestCase):
+    def setUp(self):
+        self.sp = _StubPredictor('stub', None)
+        self.ap = AsyncSectionPredictor(self.sp, batch_size=2, max_queued=1)
+
+    def tearDown(self):
+        self.ap.deallocate()
+
+    def test_order(self):
+        texts: List[str] = list(map(lambda i: f'Note{i}', range(7)))
+        notes: List[str] = asyncio.run(self.ap.predict(texts))
+        self.assertEqual(list(map(str.upper, texts)), notes)
+        self.assertEqual(texts, self.sp.parsed)
+
+    def test_iterate(self):
+        async def collect() -> List[Tuple[int, str]]:
+            return [x async for x in self.ap.iter_predict_from_docs(docs)]
+
+        docs: List[str] = ['a', 'b', 'c']
+        self.assertEqual([(0, 'A'), (1, 'B'), (2, 'C')], asyncio.run(collect()))
+        self.assertEqual([], self.sp.parsed)
+
+    def test_error(self):
+        with self.assertRaisesRegex(ValueError, 'bad note'):
+            asyncio.run(self.ap.predict(['a', 'b', 'c', 'bad', 'e']))
+
+    def test_early_exit(self):
+        async def first() -> Tuple[int, str]:
+            it = self.ap.iter_predict(texts)
+            item: Tuple[int, str] = await it.__anext__()
+            await it.aclose()
+            # give a cancelled producer the chance to parse more
+            await asyncio.sleep(0.1)
+            return item
+
+        texts: List[str] = list(map(lambda i: f'n{i}', range(40)))
+        self.assertEqual((0, 'N0'), asyncio.run(first()))
+        # parsing stops with prediction since at most one batch is queued
+        self.assertLess(len(self.sp.parsed), 10)
+
+    def test_auto_deallocate(self):
+        sp = _StubPredictor('stub', None)
+        self.assertTrue(sp.auto_deallocate)
+        ap = AsyncSectionPredictor(sp)
+        self.assertFalse(sp.auto_deallocate)
+        asyncio.run(ap.predict(['a']))
+        self.assertFalse(sp.auto_deallocate)
+        ap.deallocate()
+        self.assertTrue(sp.auto_deallocate)
@@ -0,0 +1,68 @@
+from typing import List
+import unittest
+import threading
+from concurrent.futures import Future
+from zensols.mimicsid.pred import SectionPredictor, BatchingSectionPredictor
+
+
+class _StubPredictor(SectionPredictor):
+    """Predicts the upper case text of each note and fails on ``bad``.
+
+    """
+    def __post_init__(self):
+        super().__post_init__()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.batches: List[List[str]] = []
+
+    def _predict_batch(self, docs: List[str], filter_notes: bool) -> List[str]:
+        self.gate.wait()
+        self.batches.append(list(docs))
+        if 'bad' in docs:
+            raise ValueError('bad note')
+        return list(map(str.upper, docs))
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.sp = _StubPredictor('stub', None)
+        self.bp = BatchingSectionPredictor(
+            self.sp, max_batch_size=4, max_latency=0.05)
+
+    def tearDown(self):
+        self.bp.deallocate()
+
+    def test_predict(self):
+        self.assertEqual(('A', 'B', 'C'), self.bp.predict(('a', 'b', 'c')))
+
+    def test_error(self):
+        futs: List[Future] = list(map(self.bp.submit, ('a', 'bad', 'c')))
+        self.assertEqual('A', futs[0].result(timeout=5))
+        with self.assertRaisesRegex(ValueError, 'bad note'):
+            futs[1].result(timeout=5)
+        self.assertEqual('C', futs[2].result(timeout=5))
+        self.assertEqual([['a', 'bad', 'c'], ['a'], ['bad'], ['c']],
+                         self.sp.batches)
+
+    def test_cancel(self):
+        self.sp.gate.clear()
+        first: Future = self.bp.submit('a')
+        # wait for the worker to block predicting the first note
+        while self.bp.queued > 0:
+            threading.Event().wait(0.01)
+        cancelled: Future = self.bp.submit('b')
+        self.assertTrue(cancelled.cancel())
+        after: Future = self.bp.submit('c')
+        self.sp.gate.set()
+        self.assertEqual('A', first.result(timeout=5))
+        self.assertEqual('C', after.result(timeout=5))
+        self.assertTrue(cancelled.cancelled())
+        self.assertNotIn('b', sum(self.sp.batches, []))
+        self.assertEqual(('D',), self.bp.predict(('d',)))
+
+    def test_auto_deallocate(self):
+        self.assertFalse(self.sp.auto_deallocate)
+        self.bp.predict(('a',))
+        self.assertFalse(self.sp.auto_deallocate)
+        self.bp.deallocate()
+        self.assertTrue(self.sp.auto_deallocate)
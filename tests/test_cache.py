@@ -0,0 +1,118 @@
+import unittest
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from zensols.nlp import (
+    FeatureToken, FeatureSentence, FeatureDocument, LexicalSpan
+)
+from zensols.mimic import Section
+from zensols.mimicsid import PredictedNote
+from zensols.mimicsid.cache import ParsedDocumentStash, PredictedSectionStash
+
+
+class TestParsedDocumentStash(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _create_stash(self, **kwargs) -> ParsedDocumentStash:
+        return ParsedDocumentStash(self.path, **kwargs)
+
+    def test_key(self):
+        stash = self._create_stash(parser_key='a')
+        other = self._create_stash(parser_key='b')
+        key: str = stash.create_key('note')
+        self.assertEqual(key, stash.create_key('note'))
+        self.assertNotEqual(key, stash.create_key('x'))
+        self.assertNotEqual(key, other.create_key('note'))
+
+    def test_hits(self):
+        stash = self._create_stash()
+        key: str = stash.create_key('note')
+        self.assertIsNone(stash.load(key))
+        stash.dump(key, 'doc')
+        self.assertEqual('doc', stash.load(key))
+        self.assertEqual('doc', stash.load(key))
+        self.assertEqual({'hits': 2, 'misses': 1}, stash.stats)
+        stash.clear()
+        self.assertEqual({'hits': 0, 'misses': 0}, stash.stats)
+
+    def test_evict(self):
+        stash = self._create_stash(max_entries=3)
+        for i in range(3):
+            stash.dump(f'k{i}', i)
+        # use the oldest so the second is least recently used
+        self.assertEqual(0, stash.load('k0'))
+        stash.dump('k3', 3)
+        self.assertEqual({'k0', 'k2', 'k3'}, set(stash.keys()))
+        stash.dump('k4', 4)
+        stash.dump('k5', 5)
+        self.assertEqual({'k3', 'k4', 'k5'}, set(stash.keys()))
+        stash.delete('k4')
+        stash.dump('k6', 6)
+        self.assertEqual({'k3', 'k5', 'k6'}, set(stash.keys()))
+
+    def test_evict_from_disk(self):
+        stash = self._create_stash()
+        for i in range(4):
+            stash.dump(f'k{i}', i)
+            # order the files by their modification time
+            os.utime(stash.key_to_path(f'k{i}'), (i, i))
+        stash = self._create_stash(max_entries=3)
+        self.assertEqual(1, stash.load('k1'))
+        stash.dump('k4', 4)
+        self.assertEqual({'k1', 'k3', 'k4'}, set(stash.keys()))
+
+
+class TestPredictedSectionStash(unittest.TestCase):
+    TEXT = 'Chief Complaint:\ncough\n\nHistory:\nnone'
+
+    def setUp(self):
+        self.temp_dir = TemporaryDirectory()
+        self.path = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _create_doc(self, text: str) -> FeatureDocument:
+        toks = []
+        for i, (b, e) in enumerate(((0, 5), (6, 15), (17, 22), (24, 32))):
+            toks.append(FeatureToken(i, b, 0, text[b:e], LexicalSpan(b, e)))
+        return FeatureDocument(
+            sents=(FeatureSentence(tokens=tuple(toks)),), text=text)
+
+    def test_key(self):
+        stash = PredictedSectionStash(self.path, model_key='1.0')
+        key: str = stash.create_key(5, self.TEXT)
+        self.assertTrue(key.startswith('5-'))
+        # the database text has whitespace the parsed document does not
+        self.assertEqual(key, stash.create_key(5, f'\n {self.TEXT}\n\n'))
+        self.assertNotEqual(key, stash.create_key(6, self.TEXT))
+        self.assertNotEqual(key, stash.create_key(5, self.TEXT + '.'))
+        other = PredictedSectionStash(self.path, model_key='1.1')
+        self.assertNotEqual(key, other.create_key(5, self.TEXT))
+
+    def test_note(self):
+        stash = PredictedSectionStash(self.path, model_key='1.0')
+        doc: FeatureDocument = self._create_doc(self.TEXT)
+        secs = [Section(id=0, name='chief-complaint', container=None,
+                        header_spans=(LexicalSpan(0, 15),),
+                        body_span=LexicalSpan(17, 22)),
+                Section(id=1, name='history', container=None,
+                        header_spans=(), body_span=LexicalSpan(24, 36))]
+        stash.dump_note(5, PredictedNote(predicted_sections=secs, doc=doc))
+        self.assertIsNone(stash.load_note(6, doc))
+        self.assertIsNone(PredictedSectionStash(
+            self.path, model_key='1.1').load_note(5, doc))
+        note: PredictedNote = stash.load_note(5, doc)
+        self.assertEqual(self.TEXT, note.text)
+        self.assertEqual(
+            [(0, 'chief-complaint', (LexicalSpan(0, 15),), LexicalSpan(17, 22)),
+             (1, 'history', (), LexicalSpan(24, 36))],
+            list(map(lambda s: (s.id, s.name, tuple(s.header_spans),
+                                s.body_span), note.predicted_sections)))
+        self.assertTrue(all(map(lambda s: s.container is note,
+                                note.predicted_sections)))
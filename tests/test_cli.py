@@ -0,0 +1,24 @@
+from typing import Dict, Tuple
+import unittest
+from zensols.cli import ApplicationFactory as CliApplicationFactory
+from zensols.mimicsid import ApplicationFactory
+
+
+class TestCli(unittest.TestCase):
+    """Build the command line actions, which fails on conflicting options.
+
+    """
+    def test_actions(self):
+        fac: CliApplicationFactory = \
+            ApplicationFactory.create_harness().create_application_factory()
+        actions = fac.cli_manager.actions
+        self.assertTrue({'app', 'pred_app'} <= set(actions.keys()))
+        opts: Dict[str, Tuple[str]] = {
+            m.name: tuple(sorted(map(lambda o: o.long_name, m.options)))
+            for m in actions['pred_app'].meta_datas}
+        self.assertEqual({'predict', 'corpus', 'serve', 'repredict'},
+                         set(opts.keys()))
+        self.assertIn('batch', opts['predict'])
+        self.assertIn('maxbatch', opts['serve'])
+        self.assertEqual(('cats', 'cbatch', 'cpath', 'limit', 'workers'),
+                         opts['corpus'])
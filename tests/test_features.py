@@ -0,0 +1,143 @@
+from typing import Tuple, List, Dict
+from dataclasses import dataclass
+import unittest
+import random
+from itertools import chain
+from zensols.nlp import (
+    FeatureToken, FeatureSentence, FeatureDocument, LexicalSpan
+)
+from zensols.mimic import MimicTokenDecorator
+from zensols.mimicsid.model import SectionTokenFeatures, TokenType
+
+
+@dataclass
+class _Section(object):
+    name: str
+    header_spans: Tuple[LexicalSpan]
+    body_span: LexicalSpan
+    doc: FeatureDocument
+
+    @property
+    def header_tokens(self):
+        return chain.from_iterable(
+            self.doc.map_overlapping_tokens(self.header_spans))
+
+    @property
+    def body_tokens(self):
+        return self.doc.get_overlapping_tokens(self.body_span)
+
+
+@dataclass
+class _Note(object):
+    sections: Dict[int, _Section]
+
+
+class TestSectionLabels(unittest.TestCase):
+    def setUp(self):
+        self.rand = random.Random(0)
+
+    def _create_doc(self) -> FeatureDocument:
+        toks = []
+        pos = 0
+        for i in range(self.rand.randint(0, 80)):
+            norm = 'x' * self.rand.randint(1, 5)
+            toks.append(FeatureToken(
+                i, pos, 0, norm, LexicalSpan(pos, pos + len(norm))))
+            pos += len(norm) + self.rand.randint(0, 2)
+        return FeatureDocument(sents=(FeatureSentence(tokens=tuple(toks)),))
+
+    def _create_span(self, doc: FeatureDocument) -> LexicalSpan:
+        begin = self.rand.randint(0, len(doc.text) + 3)
+        return LexicalSpan(begin, begin + self.rand.randint(0, 30))
+
+    def _create_note(self, doc: FeatureDocument) -> _Note:
+        secs = {}
+        for i in range(self.rand.randint(0, 5)):
+            hspans = tuple(map(lambda _: self._create_span(doc),
+                               range(self.rand.randint(0, 2))))
+            secs[i] = _Section(f'sec{i}', hspans, self._create_span(doc), doc)
+        return _Note(secs)
+
+    def _token_labels(self, note: _Note, doc: FeatureDocument):
+        tok2sec = {}
+        for sec in note.sections.values():
+            for tok in sec.header_tokens:
+                tok2sec[tok] = (sec.name, True)
+            for tok in sec.body_tokens:
+                tok2sec[tok] = (sec.name, False)
+        labs = tuple(map(lambda t: tok2sec.get(t, (FeatureToken.NONE, False)),
+                         doc.token_iter()))
+        return list(map(lambda x: x[0], labs)), list(map(lambda x: x[1], labs))
+
+    def test_overlapping_tokens(self):
+        for _ in range(200):
+            doc = self._create_doc()
+            note = self._create_note(doc)
+            feats = SectionTokenFeatures(doc, note)
+            names, headers = feats._get_section_labels(
+                tuple(doc.token_iter()))
+            should_names, should_headers = self._token_labels(note, doc)
+            self.assertEqual(should_names, list(names))
+            self.assertEqual(should_headers, list(headers))
+
+
+class TestTokenTypes(unittest.TestCase):
+    NORMS = ('Patient', 'HISTORY', 'history', 'x', 'X', 'Ave.', 'b12', 'B12',
+             '12', '0', '3.5', '1/2', 'mg/dL', 'pH', 'iPhone', 'Éclair', 'ß',
+             '½', '٣', ':', '.', ',', '-', '(', '**]', '#', '%', '[**')
+    SPACES = (' ', '  ', '\t', '\n', '\n\n', '\r', '\r\n', ' \n')
+
+    def setUp(self):
+        self.rand = random.Random(0)
+
+    def _create_token(self, i: int) -> FeatureToken:
+        r: float = self.rand.random()
+        is_space: bool = r < 0.2
+        norm: str = self.rand.choice(self.SPACES if is_space else self.NORMS)
+        tok = FeatureToken(i, i, 0, norm, LexicalSpan(i, i + len(norm)))
+        tok.is_space = is_space
+        # punctuation is decided by the parser, so include odd combinations
+        tok.is_punctuation = not is_space and (
+            (not norm.isalnum() and self.rand.random() < 0.8) or
+            self.rand.random() < 0.05)
+        tok.mimic_ = MimicTokenDecorator.SEPARATOR_TOKEN_FEATURE \
+            if r > 0.95 else FeatureToken.NONE
+        tok.ent_ = FeatureToken.NONE
+        tok.onto_ = FeatureToken.NONE
+        return tok
+
+    @staticmethod
+    def _classify(tok: FeatureToken) -> TokenType:
+        """The per token classification replaced by the token type codes."""
+        norm: str = tok.norm
+        if tok.mimic_ == MimicTokenDecorator.SEPARATOR_TOKEN_FEATURE:
+            return TokenType.SEP
+        elif norm == ':':
+            return TokenType.COLON
+        elif tok.is_punctuation:
+            return TokenType.PUNCTUATION
+        elif tok.is_space:
+            return {' ': TokenType.SPACE,
+                    '\t': TokenType.SPACE,
+                    '\n': TokenType.NEWLINE,
+                    '\r': TokenType.NEWLINE}[norm[0]]
+        elif norm.isupper():
+            return TokenType.UPCASE
+        elif norm.islower():
+            return TokenType.DOWNCASE
+        elif norm[0].isupper():
+            return TokenType.CAPITAL
+        elif norm.isdigit():
+            return TokenType.DIGIT
+        else:
+            return TokenType.MIX
+
+    def test_token_types(self):
+        for _ in range(300):
+            toks: List[FeatureToken] = list(map(
+                self._create_token, range(self.rand.randint(0, 60))))
+            doc = FeatureDocument(sents=(FeatureSentence(tokens=tuple(toks)),))
+            feats = SectionTokenFeatures(doc)
+            should: List[str] = list(map(
+                lambda t: self._classify(t).name, toks))
+            self.assertEqual(should, feats.dataframe['ttype'].tolist())
@@ -0,0 +1,39 @@
+from typing import Tuple, List
+import unittest
+import sys
+import json
+import subprocess
+
+
+class TestImport(unittest.TestCase):
+    """Import the package in a new interpreter to keep heavy dependencies lazy.
+
+    """
+    HEAVY_MODULES = ('zensols.mednlp', 'zensols.deeplearn',
+                     'zensols.mimicsid.compat')
+
+    def _import(self, stmt: str, modules: Tuple[str, ...] = HEAVY_MODULES) \
+            -> List[str]:
+        prog: str = f'''\
+import sys, json
+{stmt}
+print(json.dumps([m for m in {modules!r} if m in sys.modules]))
+'''
+        out: str = subprocess.check_output((sys.executable, '-c', prog))
+        return json.loads(out.decode().strip().split('\n')[-1])
+
+    def test_package_import(self):
+        self.assertEqual([], self._import(
+            'import zensols.mimicsid', self.HEAVY_MODULES + ('torch',)))
+
+    def test_domain_import(self):
+        # the domain classes need spaCy (via zensols.nlp), which loads torch
+        self.assertEqual([], self._import(
+            'from zensols.mimicsid import AnnotatedNote, SectionFilterType'))
+
+    def test_lazy_attribute(self):
+        import zensols.mimicsid
+        from zensols.mimicsid.domain import SectionFilterType
+        self.assertIs(SectionFilterType, zensols.mimicsid.SectionFilterType)
+        with self.assertRaises(AttributeError):
+            zensols.mimicsid.NoSuchAttribute
@@ -0,0 +1,91 @@
+from typing import Dict, Tuple
+from dataclasses import dataclass, field
+import unittest
+import random
+from zensols.nlp import LexicalSpan
+from zensols.mimicsid.pred import SectionPredictor
+
+
+@dataclass
+class _Section(object):
+    body_span: LexicalSpan
+    header_spans: Tuple[LexicalSpan] = field(default=())
+
+
+@dataclass
+class _Note(object):
+    text: str
+    sections: Dict[int, _Section]
+
+
+def _merge_note(sn: _Note, hn: _Note):
+    """The pairwise merge used to verify the indexed merge."""
+    def ff_chars(s, start, end, avoid):
+        p = None
+        for p in range(start, end + 1):
+            if p >= len(s):
+                break
+            if s[p] not in avoid:
+                break
+        return p
+
+    avoid = set(': \n\t\r')
+    for ssec in sn.sections.values():
+        sspan = ssec.body_span
+        hspans = []
+        for hsec in hn.sections.values():
+            hspan = hsec.body_span
+            if hspan.overlaps_with(sspan) and hspan.begin == sspan.begin:
+                if len(hspan) > 1 and sn.text[hspan.end - 1:hspan.end] == ':':
+                    hspan = LexicalSpan(hspan.begin, hspan.end - 1)
+                hspans.append(hspan)
+        if len(hspans) > 0:
+            p = ff_chars(sn.text, hspans[-1].end, sspan.end, avoid)
+            if p is None:
+                ssec.body_span = LexicalSpan(sspan.end, sspan.end)
+            else:
+                ssec.body_span = LexicalSpan(p, sspan.end)
+            ssec.header_spans = tuple(hspans)
+
+
+class TestMerge(unittest.TestCase):
+    def setUp(self):
+        self.rand = random.Random(0)
+        self.pred = SectionPredictor(name='test', config_factory=None)
+
+    def _create_text(self) -> str:
+        return ''.join(self.rand.choices(
+            'ab :\n\t', k=self.rand.randint(0, 60)))
+
+    def _create_spans(self, text: str, n: int) -> Tuple[LexicalSpan]:
+        # few distinct begins so sections and headers often begin together
+        begins = tuple(self.rand.sample(range(len(text) + 3), 3)) \
+            if len(text) > 0 else (0,)
+        spans = []
+        for _ in range(n):
+            begin = self.rand.choice(begins)
+            end = begin + self.rand.randint(0, 15)
+            spans.append(LexicalSpan(begin, end))
+        return tuple(spans)
+
+    def _create_notes(self) -> Tuple[_Note, _Note, _Note]:
+        text = self._create_text()
+        sspans = self._create_spans(text, self.rand.randint(0, 6))
+        hspans = self._create_spans(text, self.rand.randint(0, 12))
+
+        def create(spans):
+            return _Note(text, dict(map(lambda x: (x[0], _Section(x[1])),
+                                        enumerate(spans))))
+
+        return create(sspans), create(sspans), create(hspans)
+
+    def _sections(self, note: _Note):
+        return tuple(map(lambda s: (s.body_span, s.header_spans),
+                         note.sections.values()))
+
+    def test_merge(self):
+        for _ in range(500):
+            should, sn, hn = self._create_notes()
+            _merge_note(should, hn)
+            self.pred._merge_note(sn, hn)
+            self.assertEqual(self._sections(should), self._sections(sn))
@@ -0,0 +1,43 @@
+import unittest
+import json
+import pickle
+from zensols.mimicsid.stats import PredictionStats
+
+
+class TestPredictionStats(unittest.TestCase):
+    def _create_stats(self) -> PredictionStats:
+        stats = PredictionStats()
+        stats.add_time('parse', 0.5)
+        stats.add_time('parse', 0.25)
+        with stats.time('merge'):
+            pass
+        stats.count(notes=2, tokens=30, sections=5)
+        stats.count(notes=1, tokens=10, sections=2)
+        return stats
+
+    def test_counts(self):
+        stats: PredictionStats = self._create_stats()
+        self.assertEqual(0.75, stats.seconds['parse'])
+        self.assertEqual({'parse': 2, 'merge': 1}, stats.calls)
+        self.assertEqual((3, 40, 7),
+                         (stats.notes, stats.tokens, stats.sections))
+        stats.clear()
+        self.assertEqual(PredictionStats().asdict(), stats.asdict())
+
+    def test_json(self):
+        stats: PredictionStats = self._create_stats()
+        dct = json.loads(stats.asjson())
+        self.assertEqual({'seconds', 'calls', 'notes', 'tokens', 'sections'},
+                         set(dct.keys()))
+        restored = PredictionStats(**dct)
+        self.assertEqual(stats.asdict(), restored.asdict())
+        self.assertEqual(stats.asjson(), restored.asjson())
+        restored.add_time('parse', 1)
+        self.assertEqual(3, restored.calls['parse'])
+
+    def test_pickle(self):
+        stats: PredictionStats = self._create_stats()
+        restored: PredictionStats = pickle.loads(pickle.dumps(stats))
+        self.assertEqual(stats.asdict(), restored.asdict())
+        restored.count(notes=1)
+        self.assertEqual(4, restored.notes)
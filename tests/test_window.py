@@ -0,0 +1,115 @@
+from typing import List, Tuple
+import unittest
+import random
+import numpy as np
+from zensols.nlp import (
+    FeatureToken, FeatureSentence, FeatureDocument, LexicalSpan
+)
+from zensols.mimicsid.model import SectionPredictionMapper
+
+
+class TestWindow(unittest.TestCase):
+    def setUp(self):
+        self.rand = random.Random(0)
+
+    def _create_mapper(self, size: int, overlap: int) -> \
+            SectionPredictionMapper:
+        # only the window fields and feature state are used
+        mapper = object.__new__(SectionPredictionMapper)
+        mapper.window_size = size
+        mapper.window_overlap = overlap
+        return mapper
+
+    def _create_doc(self, sent_lens: List[int],
+                    newline: float = 0) -> FeatureDocument:
+        sents = []
+        i = 0
+        for slen in sent_lens:
+            toks = []
+            for _ in range(slen):
+                space = self.rand.random() < newline
+                norm = '\n' if space else 'x'
+                tok = FeatureToken(i, i, 0, norm, LexicalSpan(i, i + 1))
+                tok.is_space = space
+                toks.append(tok)
+                i += 1
+            sents.append(FeatureSentence(tokens=tuple(toks)))
+        return FeatureDocument(sents=tuple(sents))
+
+    def _assert_spans(self, spans: List[Tuple[int, int]], tok_len: int,
+                      size: int, overlap: int):
+        self.assertEqual(0, spans[0][0])
+        self.assertEqual(tok_len, spans[-1][1])
+        for begin, end in spans:
+            self.assertLess(begin, end)
+            self.assertLessEqual(end - begin, size)
+        for (pbeg, pend), (begin, end) in zip(spans, spans[1:]):
+            self.assertLess(pbeg, begin)
+            self.assertLess(pend, end)
+            self.assertLessEqual(begin, pend)
+            self.assertLessEqual(pend - begin, overlap)
+
+    def test_short(self):
+        mapper = self._create_mapper(100, 10)
+        doc = self._create_doc([40, 60])
+        self.assertEqual([(0, 100)], mapper._get_window_spans(doc))
+        mapper.window_size = None
+        self.assertEqual([(0, 100)], mapper._get_window_spans(doc))
+
+    def test_long_sentence(self):
+        mapper = self._create_mapper(100, 10)
+        for sent_lens in ([1000], [150, 850]):
+            doc = self._create_doc(sent_lens)
+            spans = mapper._get_window_spans(doc)
+            self.assertEqual((0, 100), spans[0])
+            self._assert_spans(spans, 1000, 100, 10)
+
+    def test_sentence_bounds(self):
+        mapper = self._create_mapper(100, 0)
+        doc = self._create_doc([60, 30, 50, 40])
+        self.assertEqual([(0, 90), (90, 180)], mapper._get_window_spans(doc))
+
+    def test_random(self):
+        for _ in range(300):
+            size = self.rand.randint(2, 60)
+            overlap = self.rand.randint(0, size)
+            mapper = self._create_mapper(size, overlap)
+            doc = self._create_doc(
+                [self.rand.randint(1, 80)
+                 for _ in range(self.rand.randint(1, 6))],
+                newline=self.rand.choice((0, 0.05)))
+            spans = mapper._get_window_spans(doc)
+            self._assert_spans(spans, doc.token_len, size, min(overlap,
+                                                               size // 2))
+
+    def test_stitch(self):
+        for _ in range(200):
+            size = self.rand.randint(2, 40)
+            mapper = self._create_mapper(size, self.rand.randint(0, size))
+            mapper._docs = []
+            mapper._feature_spans = []
+            truths = []
+            for doc_idx in range(self.rand.randint(1, 4)):
+                doc = self._create_doc(
+                    [self.rand.randint(0, 60)
+                     for _ in range(self.rand.randint(1, 3))])
+                mapper._docs.append(doc)
+                truths.append(np.array(
+                    [self.rand.randint(0, 9) for _ in range(doc.token_len)]))
+                mapper._feature_spans.extend(map(
+                    lambda s: (doc_idx, *s), mapper._get_window_spans(doc)))
+            # batch the features out of order as the bucketing does
+            idxs = list(range(len(mapper._feature_spans)))
+            self.rand.shuffle(idxs)
+            bsize = self.rand.randint(1, 4)
+            mapper._batch_feature_idxs = [
+                tuple(idxs[i:i + bsize]) for i in range(0, len(idxs), bsize)]
+            classes = []
+            for batch_idxs in mapper._batch_feature_idxs:
+                classes.append(np.concatenate(
+                    [truths[d][b:e] for d, b, e in
+                     map(lambda i: mapper._feature_spans[i], batch_idxs)]))
+            stitched = mapper._stitch_classes(classes)
+            self.assertEqual(len(truths), len(stitched))
+            for truth, labels in zip(truths, stitched):
+                self.assertEqual(truth.tolist(), labels.tolist())